@@ -112,7 +112,9 @@ class Configuration:
         """
         x, y= self.pos
         dx, dy = vector
-        direction = Actions.vectorToDirection(vector)
+        direction = Actions._vectorDirections.get(vector)
+        if direction is None:
+            direction = Actions.vectorToDirection(vector)
         if direction == Directions.STOP:
             direction = self.direction # There is no stop direction
         return Configuration((x + dx, y+dy), direction)
@@ -297,6 +299,27 @@ class Actions:
 
     _directionsAsList = _directions.items()
 
+    # Directions are also numbered by their place in _directionsAsList, so a
+    # set of directions is a bitmask; _maskActions lists the directions of
+    # each mask in that order.
+    _directionList = [direction for direction, vector in _directionsAsList]
+    _directionIndex = {}
+    _maskActions = [[]]
+    for _index, _direction in enumerate(_directionList):
+        _directionIndex[_direction] = _index
+        for _mask in range(len(_maskActions)):
+            _maskActions.append(_maskActions[_mask] + [_direction])
+    del _index, _direction, _mask
+
+    # Movement vectors by type and value of speed, and the direction of each
+    _scaledVectors = {int: {}, float: {}}
+    _vectorDirections = {}
+
+    # The legal-move tables of the last few walls layouts seen, by their
+    # contents; past _legalTablesKept layouts the oldest is dropped
+    _legalTables = {}
+    _legalTablesKept = 8
+
     TOLERANCE = .001
 
     def reverseDirection(action):
@@ -324,12 +347,77 @@ class Actions:
         return Directions.STOP
     vectorToDirection = staticmethod(vectorToDirection)
 
-    def directionToVector(direction, speed = 1.0):
-        dx, dy =  Actions._directions[direction]
+    def directionToVector(direction, speed=1.0):
+        try:
+            return Actions._scaledVectors[type(speed)][speed][direction]
+        except KeyError:
+            pass
+        dx, dy = Actions._directions[direction]
+        if type(speed) in Actions._scaledVectors and speed > 0:
+            vectors = dict((each, (vx * speed, vy * speed))
+                           for each, (vx, vy) in Actions._directionsAsList)
+            Actions._scaledVectors[type(speed)][speed] = vectors
+            for each, vector in vectors.items():
+                Actions._vectorDirections[vector] = each
         return (dx * speed, dy * speed)
     directionToVector = staticmethod(directionToVector)
 
+    def directionToIndex(direction):
+        return Actions._directionIndex[direction]
+    directionToIndex = staticmethod(directionToIndex)
+
+    def indexToDirection(index):
+        return Actions._directionList[index]
+    indexToDirection = staticmethod(indexToDirection)
+
+    def maskToActions(mask):
+        return Actions._maskActions[mask][:]
+    maskToActions = staticmethod(maskToActions)
+
+    def getLegalMasks(walls):
+        """
+        Returns a dict from each grid point (x, y) of walls to the bitmask of
+        its legal moves, bit i standing for the move in _directionsAsList[i].
+        Moves off the grid are never legal.  The masks are worked out the
+        first time a walls grid is queried and kept on it, so the walls are
+        taken to be fixed from then on.  Copies of the same walls (every
+        observation of a game carries one) share the tables.
+        """
+        try:
+            return walls._legalMasks
+        except AttributeError:
+            pass
+        key = tuple(map(tuple, walls.data))
+        tables = Actions._legalTables.get(key)
+        if tables is not None:
+            walls._legalMasks, walls._legalNeighbors = tables
+            return walls._legalMasks
+        masks, neighbors = {}, {}
+        width, height = walls.width, walls.height
+        for x in range(width):
+            for y in range(height):
+                mask, cells = 0, []
+                for index, (direction, (dx, dy)) in enumerate(Actions._directionsAsList):
+                    next_x, next_y = x + dx, y + dy
+                    if 0 <= next_x < width and 0 <= next_y < height and not walls[next_x][next_y]:
+                        mask |= 1 << index
+                        cells.append((next_x, next_y))
+                masks[(x, y)] = mask
+                neighbors[(x, y)] = cells
+        walls._legalNeighbors = neighbors
+        walls._legalMasks = masks
+        legalTables = Actions._legalTables
+        if len(legalTables) >= Actions._legalTablesKept:
+            del legalTables[next(iter(legalTables))]
+        legalTables[key] = (masks, neighbors)
+        return masks
+    getLegalMasks = staticmethod(getLegalMasks)
+
     def getPossibleActions(config, walls):
+        mask = Actions.getLegalMasks(walls).get(config.pos)
+        if mask is not None:
+            return Actions._maskActions[mask][:]
+
         possible = []
         x, y = config.pos
         x_int, y_int = int(x + 0.5), int(y + 0.5)
@@ -351,6 +439,11 @@ class Actions:
     def getLegalNeighbors(position, walls):
         x,y = position
         x_int, y_int = int(x + 0.5), int(y + 0.5)
+        Actions.getLegalMasks(walls)
+        neighbors = walls._legalNeighbors.get((x_int, y_int))
+        if neighbors is not None:
+            return neighbors[:]
+
         neighbors = []
         for dir, vec in Actions._directionsAsList:
             dx, dy = vec
@@ -0,0 +1,110 @@
+# mazeGraph.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+A maze with its corridors collapsed into weighted edges.
+
+Most cells of a maze have exactly two open neighbors: a search that steps
+through them one at a time expands every cell of every corridor, though
+there is never a choice to make until the corridor ends.  A MazeGraph keeps
+only the cells where there is something to decide -- junctions, dead ends
+and any key cells the problem cares about (the start, goals, food) -- and
+joins them by the corridors between them.  Each edge remembers the actions
+and cells of its corridor, so a plan in the graph expands back to steps.
+"""
+
+from game import Directions, Actions
+
+
+class MazeGraph:
+    """
+    The graph of a maze given by its walls (a Grid), whose nodes are the
+    junctions and dead ends plus keyCells.  Edges are found the first time
+    a node is expanded:
+
+      graph.getEdges(node) -> [(neighbor, actions, cells), ...]
+
+    where actions is the tuple of steps from node to neighbor and cells the
+    tuple of cells they enter (ending with neighbor).
+    """
+
+    DIRECTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]
+
+    def __init__(self, walls, keyCells=()):
+        self.walls = walls
+        self.nodes = set(keyCells)
+        for x in range(walls.width):
+            for y in range(walls.height):
+                if not walls[x][y] and len(self.getMoves((x, y))) != 2:
+                    self.nodes.add((x, y))
+        self.edges = {}
+
+    def getMoves(self, cell):
+        "The actions out of cell and the cells they lead to, in the usual order"
+        x, y = cell
+        moves = []
+        for action in self.DIRECTIONS:
+            dx, dy = Actions.directionToVector(action)
+            nextx, nexty = int(x + dx), int(y + dy)
+            if not self.walls[nextx][nexty]:
+                moves.append((action, (nextx, nexty)))
+        return moves
+
+    def isNode(self, cell):
+        return cell in self.nodes
+
+    def getEdges(self, node):
+        if node not in self.edges:
+            self.edges[node] = self.compileEdges(node)
+        return self.edges[node]
+
+    def compileEdges(self, node):
+        """
+        Walks each corridor out of node to the next node.  A corridor that
+        loops back to node is dropped; it leads nowhere new.
+        """
+        edges = []
+        for action, cell in self.getMoves(node):
+            actions, cells = [action], [cell]
+            while cell not in self.nodes:
+                # A corridor cell: leave by the way we did not come in
+                reverse = Actions.reverseDirection(actions[-1])
+                for action, nextCell in self.getMoves(cell):
+                    if action != reverse:
+                        break
+                cell = nextCell
+                actions.append(action)
+                cells.append(cell)
+            if cell != node:
+                edges.append((cell, tuple(actions), tuple(cells)))
+        return edges
+
+    def getNumNodes(self):
+        return len(self.nodes)
+
+
+def expandActions(actions):
+    """
+    Flattens a plan of corridor walks (tuples of actions, as in the edges of
+    a MazeGraph) into single steps.  Single actions are left as they are.
+    """
+    if actions is None:
+        return None
+    steps = []
+    for action in actions:
+        if isinstance(action, tuple):
+            steps.extend(action)
+        else:
+            steps.append(action)
+    return steps
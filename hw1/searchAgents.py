@@ -49,6 +49,7 @@ from game import Actions
 import util
 import time
 import search
+import mazeGraph
 
 
 class GoWestAgent(Agent):
@@ -734,4 +735,110 @@ class AnyFoodSearchProblem(PositionSearchProblem):
 
 
         "*** YOUR CODE HERE ***"
-        util.raiseNotDefined()
\ No newline at end of file
+        util.raiseNotDefined()
+
+
+#######################################################
+# Search problems on the compressed maze graph        #
+#######################################################
+
+
+class CompressedSearchAgent(SearchAgent):
+    """
+    A SearchAgent for the compressed problems below, whose actions are whole
+    corridors (see mazeGraph.py).  The plan is expanded into single steps
+    before Pacman follows it.
+
+    Edges have the length of their corridor as cost, so use ucs or astar for
+    shortest paths; dfs and bfs count corridors rather than steps.
+
+    > python pacman.py -l bigMaze -p CompressedSearchAgent -a fn=ucs
+    > python pacman.py -l mediumCorners -p CompressedSearchAgent -a fn=aStarSearch,prob=CompressedCornersProblem,heuristic=cornersHeuristic
+    """
+
+    def __init__(self, fn='uniformCostSearch', prob='CompressedPositionSearchProblem', heuristic='nullHeuristic'):
+        SearchAgent.__init__(self, fn, prob, heuristic)
+
+    def registerInitialState(self, state):
+        SearchAgent.registerInitialState(self, state)
+        self.actions = mazeGraph.expandActions(self.actions)
+
+
+class CompressedPositionSearchProblem(PositionSearchProblem):
+    """
+    A PositionSearchProblem whose states are only the nodes of the maze graph
+    (junctions, dead ends, the start and the goal).  Each successor follows a
+    corridor to the next node, at the cost of the cells it enters.
+    """
+
+    def __init__(self, gameState, costFn = lambda x: 1, goal=(1,1), start=None, warn=True, visualize=True):
+        PositionSearchProblem.__init__(self, gameState, costFn, goal, start, warn, visualize)
+        self.graph = mazeGraph.MazeGraph(self.walls, [self.startState, self.goal])
+
+    def getSuccessors(self, state):
+        successors = []
+        for nextState, actions, cells in self.graph.getEdges(state):
+            cost = sum(self.costFn(cell) for cell in cells)
+            successors.append( ( nextState, actions, cost) )
+
+        # Bookkeeping for display purposes
+        self._expanded += 1 # DO NOT CHANGE
+        if state not in self._visited:
+            self._visited[state] = True
+            self._visitedlist.append(state)
+
+        return successors
+
+    def getCostOfActions(self, actions):
+        return PositionSearchProblem.getCostOfActions(self, mazeGraph.expandActions(actions))
+
+
+class CompressedCornersProblem(CornersProblem):
+    """
+    A CornersProblem on the maze graph.  The corners are nodes, so a corridor
+    never passes one on the way.
+    """
+
+    def __init__(self, startingGameState):
+        CornersProblem.__init__(self, startingGameState)
+        self.graph = mazeGraph.MazeGraph(self.walls, (self.startingPosition,) + self.corners)
+
+    def getSuccessors(self, state):
+        successors = []
+        for cord, actions, cells in self.graph.getEdges(state[0]):
+            visited = list(state[1:])
+            if cord in self.corners:
+                visited[self.corners.index(cord)] = True
+            successors.append(((cord,) + tuple(visited), actions, len(cells)))
+
+        self._expanded += 1 # DO NOT CHANGE
+        return successors
+
+    def getCostOfActions(self, actions):
+        return CornersProblem.getCostOfActions(self, mazeGraph.expandActions(actions))
+
+
+class CompressedFoodSearchProblem(FoodSearchProblem):
+    """
+    A FoodSearchProblem on the maze graph.  Every food is a node, so a
+    corridor eats at most the food at its end.
+    """
+
+    def __init__(self, startingGameState):
+        FoodSearchProblem.__init__(self, startingGameState)
+        keyCells = [self.start[0]] + self.start[1].asList()
+        self.graph = mazeGraph.MazeGraph(self.walls, keyCells)
+
+    def getSuccessors(self, state):
+        successors = []
+        self._expanded += 1 # DO NOT CHANGE
+        for (nextx, nexty), actions, cells in self.graph.getEdges(state[0]):
+            nextFood = state[1]
+            if nextFood[nextx][nexty]:
+                nextFood = nextFood.copy()
+                nextFood[nextx][nexty] = False
+            successors.append( ( ((nextx, nexty), nextFood), actions, len(cells)) )
+        return successors
+
+    def getCostOfActions(self, actions):
+        return FoodSearchProblem.getCostOfActions(self, mazeGraph.expandActions(actions))
@@ -82,6 +82,11 @@ def readCommand(argv):
                       dest='noGraphics',
                       action='store_true',
                       help='No graphics display for pacman games.')
+    parser.add_option('--parallel',
+                      dest='parallel',
+                      type='int',
+                      default=0,
+                      help='Play the games of agent evaluations over this many worker processes, without graphics.')
     (options, args) = parser.parse_args(argv)
     return options
 
@@ -348,6 +353,7 @@ if __name__ == '__main__':
     moduleName = re.match('.*?([^/]*)\.py', options.testCaseCode).group(1)
     moduleDict['projectTestClasses'] = loadModuleFile(
         moduleName, os.path.join(options.codeRoot, options.testCaseCode))
+    moduleDict['projectTestClasses'].PARALLEL = options.parallel
 
     if options.runTest != None:
         runTest(options.runTest, moduleDict, printTestCase=options.printTestCase,
@@ -0,0 +1,84 @@
+# benchmarkSnapshots.py
+# ---------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Times headless games with the observations handed to agents made by
+snapshot() and by a strict deepCopy(), in moves per second:
+
+  python benchmarkSnapshots.py [-l mediumClassic] [-n 20]
+
+Both modes play the same seeded games with agents that spend next to no
+time deciding, so the difference is the cost of the observations.  The
+last columns count the food grids handed to Pacman and the food eaten:
+a snapshot copies the food once per game and then once per food eaten,
+not on every move.
+"""
+
+from ghostAgents import RandomGhost
+import layout
+import optparse
+import pacman
+import pacmanAgents
+import random
+import textDisplay
+import time
+
+
+class CountingAgent(pacmanAgents.LeftTurnAgent):
+    "A LeftTurnAgent that keeps the food grid of every state it is handed"
+
+    def __init__(self, index=0):
+        pacmanAgents.LeftTurnAgent.__init__(self, index)
+        self.foodGrids = []
+
+    def getAction(self, state):
+        self.foodGrids.append(state.getFood())
+        return pacmanAgents.LeftTurnAgent.getAction(self, state)
+
+
+def playGames(lay, numGames, strict, seed=0):
+    """
+    Plays numGames games, returning the moves made, the seconds taken, the
+    number of distinct food grids Pacman was handed and the food eaten.
+    """
+    random.seed(seed)
+    rules = pacman.ClassicGameRules()
+    moves, seconds, foodGrids, eaten = 0, 0.0, 0, 0
+    for i in range(numGames):
+        agent = CountingAgent()
+        ghosts = [RandomGhost(index) for index in range(1, lay.getNumGhosts() + 1)]
+        game = rules.newGame(lay, agent, ghosts, textDisplay.NullGraphics(), quiet=True)
+        game.strictObservations = strict
+        start = time.perf_counter()
+        game.run()
+        seconds += time.perf_counter() - start
+        moves += len(game.moveHistory)
+        foodGrids += len(set(id(food) for food in agent.foodGrids))
+        eaten += lay.food.count() - game.state.getNumFood()
+    return moves, seconds, foodGrids, eaten
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser()
+    parser.add_option('-l', '--layout', dest='layout', default='mediumClassic',
+                      help='Layout to play (default %default)')
+    parser.add_option('-n', '--games', dest='games', type='int', default=20,
+                      help='Games in each mode (default %default)')
+    options, args = parser.parse_args()
+
+    lay = layout.getLayout(options.layout)
+    print('%-10s %8s %10s %11s %11s' % ('mode', 'moves', 'moves/s', 'food grids', 'food eaten'))
+    for name, strict in [('deepCopy', True), ('snapshot', False)]:
+        moves, seconds, foodGrids, eaten = playGames(lay, options.games, strict)
+        print('%-10s %8d %10.0f %11d %11d' % (name, moves, moves / seconds, foodGrids, eaten))
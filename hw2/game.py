@@ -118,7 +118,9 @@ class Configuration:
         """
         x, y = self.pos
         dx, dy = vector
-        direction = Actions.vectorToDirection(vector)
+        direction = Actions._vectorDirections.get(vector)
+        if direction is None:
+            direction = Actions.vectorToDirection(vector)
         if direction == Directions.STOP:
             direction = self.direction  # There is no stop direction
         return Configuration((x + dx, y+dy), direction)
@@ -169,6 +171,23 @@ class AgentState:
         return self.configuration.getDirection()
 
 
+class ReadOnlyList(list):
+    """
+    A list that refuses to change, for the columns of read-only grids.
+    Slicing it gives an ordinary list, so Grid.copy of a read-only grid
+    is writable.
+    """
+
+    def refuse(self, *args, **kwargs):
+        raise TypeError('This grid is read-only; copy() it to make changes')
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = refuse
+    append = extend = insert = pop = remove = clear = sort = reverse = refuse
+
+    def __reduce__(self):
+        return (ReadOnlyList, (list(self),))
+
+
 class Grid:
     """
     A 2-dimensional array of objects backed by a list of lists.  Data is accessed
@@ -229,8 +248,27 @@ class Grid:
     def shallowCopy(self):
         g = Grid(self.width, self.height)
         g.data = self.data
+        # The copy shares the data, so it can share its read-only copy too
+        readOnly = getattr(self, '_readOnly', None)
+        if readOnly is not None:
+            g._readOnly = readOnly
         return g
 
+    def readOnlyCopy(self):
+        """
+        A copy of the grid that raises TypeError when written to.  It is
+        made the first time it is asked for and kept, and shallow copies
+        of the grid share it along with the data, so neither the grid nor
+        its shallow copies may change from then on.
+        """
+        readOnly = getattr(self, '_readOnly', None)
+        if readOnly is None:
+            readOnly = Grid(self.width, self.height)
+            readOnly.data = ReadOnlyList([ReadOnlyList(column) for column in self.data])
+            readOnly._readOnly = readOnly
+            self._readOnly = readOnly
+        return readOnly
+
     def count(self, item=True):
         return sum([x.count(item) for x in self.data])
 
@@ -317,6 +355,27 @@ class Actions:
 
     _directionsAsList = [('West', (-1, 0)), ('Stop', (0, 0)), ('East', (1, 0)), ('North', (0, 1)), ('South', (0, -1))]
 
+    # Directions are also numbered by their place in _directionsAsList, so a
+    # set of directions is a bitmask; _maskActions lists the directions of
+    # each mask in that order.
+    _directionList = [direction for direction, vector in _directionsAsList]
+    _directionIndex = {}
+    _maskActions = [[]]
+    for _index, _direction in enumerate(_directionList):
+        _directionIndex[_direction] = _index
+        for _mask in range(len(_maskActions)):
+            _maskActions.append(_maskActions[_mask] + [_direction])
+    del _index, _direction, _mask
+
+    # Movement vectors by type and value of speed, and the direction of each
+    _scaledVectors = {int: {}, float: {}}
+    _vectorDirections = {}
+
+    # The legal-move tables of the last few walls layouts seen, by their
+    # contents; past _legalTablesKept layouts the oldest is dropped
+    _legalTables = {}
+    _legalTablesKept = 8
+
     TOLERANCE = .001
 
     def reverseDirection(action):
@@ -345,11 +404,76 @@ class Actions:
     vectorToDirection = staticmethod(vectorToDirection)
 
     def directionToVector(direction, speed=1.0):
+        try:
+            return Actions._scaledVectors[type(speed)][speed][direction]
+        except KeyError:
+            pass
         dx, dy = Actions._directions[direction]
+        if type(speed) in Actions._scaledVectors and speed > 0:
+            vectors = dict((each, (vx * speed, vy * speed))
+                           for each, (vx, vy) in Actions._directionsAsList)
+            Actions._scaledVectors[type(speed)][speed] = vectors
+            for each, vector in vectors.items():
+                Actions._vectorDirections[vector] = each
         return (dx * speed, dy * speed)
     directionToVector = staticmethod(directionToVector)
 
+    def directionToIndex(direction):
+        return Actions._directionIndex[direction]
+    directionToIndex = staticmethod(directionToIndex)
+
+    def indexToDirection(index):
+        return Actions._directionList[index]
+    indexToDirection = staticmethod(indexToDirection)
+
+    def maskToActions(mask):
+        return Actions._maskActions[mask][:]
+    maskToActions = staticmethod(maskToActions)
+
+    def getLegalMasks(walls):
+        """
+        Returns a dict from each grid point (x, y) of walls to the bitmask of
+        its legal moves, bit i standing for the move in _directionsAsList[i].
+        Moves off the grid are never legal.  The masks are worked out the
+        first time a walls grid is queried and kept on it, so the walls are
+        taken to be fixed from then on.  Copies of the same walls (every
+        observation of a game carries one) share the tables.
+        """
+        try:
+            return walls._legalMasks
+        except AttributeError:
+            pass
+        key = tuple(map(tuple, walls.data))
+        tables = Actions._legalTables.get(key)
+        if tables is not None:
+            walls._legalMasks, walls._legalNeighbors = tables
+            return walls._legalMasks
+        masks, neighbors = {}, {}
+        width, height = walls.width, walls.height
+        for x in range(width):
+            for y in range(height):
+                mask, cells = 0, []
+                for index, (direction, (dx, dy)) in enumerate(Actions._directionsAsList):
+                    next_x, next_y = x + dx, y + dy
+                    if 0 <= next_x < width and 0 <= next_y < height and not walls[next_x][next_y]:
+                        mask |= 1 << index
+                        cells.append((next_x, next_y))
+                masks[(x, y)] = mask
+                neighbors[(x, y)] = cells
+        walls._legalNeighbors = neighbors
+        walls._legalMasks = masks
+        legalTables = Actions._legalTables
+        if len(legalTables) >= Actions._legalTablesKept:
+            del legalTables[next(iter(legalTables))]
+        legalTables[key] = (masks, neighbors)
+        return masks
+    getLegalMasks = staticmethod(getLegalMasks)
+
     def getPossibleActions(config, walls):
+        mask = Actions.getLegalMasks(walls).get(config.pos)
+        if mask is not None:
+            return Actions._maskActions[mask][:]
+
         possible = []
         x, y = config.pos
         x_int, y_int = int(x + 0.5), int(y + 0.5)
@@ -372,6 +496,11 @@ class Actions:
     def getLegalNeighbors(position, walls):
         x, y = position
         x_int, y_int = int(x + 0.5), int(y + 0.5)
+        Actions.getLegalMasks(walls)
+        neighbors = walls._legalNeighbors.get((x_int, y_int))
+        if neighbors is not None:
+            return neighbors[:]
+
         neighbors = []
         for dir, vec in Actions._directionsAsList:
             dx, dy = vec
@@ -425,6 +554,26 @@ class GameStateData:
         state._capsuleEaten = self._capsuleEaten
         return state
 
+    def snapshot(self):
+        """
+        Like deepCopy, but shares the layout with this state and gives it
+        a read-only copy of the food grid (see Grid.readOnlyCopy).
+        Successors share the food grid's data until food is eaten, and
+        with it the read-only copy, so a new one is made only on the
+        moves that eat.  Successors never modify the grids of their
+        predecessors (food is copied before it is eaten), so the live
+        game's food stays as it is; a holder of the snapshot that writes
+        to its food gets a TypeError rather than changing the game.
+        Successors of the snapshot copy the food as usual before eating.
+        """
+        state = GameStateData(self)
+        state.food = self.food.readOnlyCopy()
+        state._agentMoved = self._agentMoved
+        state._foodEaten = self._foodEaten
+        state._foodAdded = self._foodAdded
+        state._capsuleEaten = self._capsuleEaten
+        return state
+
     def copyAgentStates(self, agentStates):
         copiedStates = []
         for agentState in agentStates:
@@ -550,7 +699,7 @@ class Game:
     The Game manages the control flow, soliciting actions from agents.
     """
 
-    def __init__(self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False):
+    def __init__(self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False, strictObservations=None):
         self.agentCrashed = False
         self.agents = agents
         self.display = display
@@ -559,10 +708,17 @@ class Game:
         self.gameOver = False
         self.muteAgents = muteAgents
         self.catchExceptions = catchExceptions
+        # Deep copy the states handed to agents, so that an agent can't change
+        # the game by writing to them.  On by default for untrusted agents.
+        if strictObservations is None:
+            strictObservations = catchExceptions
+        self.strictObservations = strictObservations
         self.moveHistory = []
+        self.recorder = None  # e.g. a recording.GameRecorder
         self.totalAgentTimes = [0 for agent in agents]
         self.totalAgentTimeWarnings = [0 for agent in agents]
         self.agentTimeout = False
+        self.timer = TimeoutTimer()
         import io
         self.agentOutput = [io.StringIO() for agent in agents]
 
@@ -601,10 +757,29 @@ class Game:
         sys.stdout = OLD_STDOUT
         sys.stderr = OLD_STDERR
 
+    def observeState(self):
+        """
+        Returns a copy of the current state to hand to an agent: a snapshot
+        sharing the unchanged grids with the game, or a deep copy in strict
+        mode.
+        """
+        if self.strictObservations:
+            return self.state.deepCopy()
+        return self.state.snapshot()
+
     def run(self):
         """
         Main control loop for game play.
         """
+        # Agents' time limits are enforced only when exceptions are caught
+        if self.catchExceptions:
+            self.timer.start()
+        try:
+            self.playGame()
+        finally:
+            self.timer.stop()
+
+    def playGame(self):
         self.display.initialize(self.state.data)
         self.numMoves = 0
 
@@ -620,15 +795,14 @@ class Game:
                 self.unmute()
                 self._agentCrash(i, quiet=True)
                 return
-            if ("registerInitialState" in dir(agent)):
+            if hasattr(agent, 'registerInitialState'):
                 self.mute(i)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(
-                            agent.registerInitialState, int(self.rules.getMaxStartupTime(i)))
                         try:
                             start_time = time.time()
-                            timed_func(self.state.deepCopy())
+                            self.timer.call(self.rules.getMaxStartupTime(i),
+                                            agent.registerInitialState, self.observeState())
                             time_taken = time.time() - start_time
                             self.totalAgentTimes[i] += time_taken
                         except TimeoutFunctionException:
@@ -643,12 +817,15 @@ class Game:
                         self.unmute()
                         return
                 else:
-                    agent.registerInitialState(self.state.deepCopy())
+                    agent.registerInitialState(self.observeState())
                 # TODO: could this exceed the total time
                 self.unmute()
 
         agentIndex = self.startingIndex
         numAgents = len(self.agents)
+        # Look up the agents' optional methods once, rather than every turn
+        observers = [getattr(agent, 'observationFunction', None)
+                     for agent in self.agents]
 
         while not self.gameOver:
             # Fetch the next agent
@@ -656,15 +833,15 @@ class Game:
             move_time = 0
             skip_action = False
             # Generate an observation of the state
-            if 'observationFunction' in dir(agent):
+            observe = observers[agentIndex]
+            if observe is not None:
                 self.mute(agentIndex)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.observationFunction, int(
-                            self.rules.getMoveTimeout(agentIndex)))
                         try:
                             start_time = time.time()
-                            observation = timed_func(self.state.deepCopy())
+                            observation = self.timer.call(self.rules.getMoveTimeout(agentIndex),
+                                                          observe, self.observeState())
                         except TimeoutFunctionException:
                             skip_action = True
                         move_time += time.time() - start_time
@@ -674,24 +851,22 @@ class Game:
                         self.unmute()
                         return
                 else:
-                    observation = agent.observationFunction(
-                        self.state.deepCopy())
+                    observation = observe(self.observeState())
                 self.unmute()
             else:
-                observation = self.state.deepCopy()
+                observation = self.observeState()
 
             # Solicit an action
             action = None
             self.mute(agentIndex)
             if self.catchExceptions:
                 try:
-                    timed_func = TimeoutFunction(agent.getAction, int(
-                        self.rules.getMoveTimeout(agentIndex)) - int(move_time))
                     try:
                         start_time = time.time()
                         if skip_action:
                             raise TimeoutFunctionException()
-                        action = timed_func(observation)
+                        action = self.timer.call(self.rules.getMoveTimeout(agentIndex) - move_time,
+                                                 agent.getAction, observation)
                     except TimeoutFunctionException:
                         print("Agent %d timed out on a single move!" %
                               agentIndex, file=sys.stderr)
@@ -734,6 +909,8 @@ class Game:
 
             # Execute the action
             self.moveHistory.append((agentIndex, action))
+            if self.recorder is not None:
+                self.recorder.record(agentIndex, action)
             if self.catchExceptions:
                 try:
                     self.state = self.state.generateSuccessor(
@@ -764,7 +941,7 @@ class Game:
 
         # inform a learning agent of the game result
         for agentIndex, agent in enumerate(self.agents):
-            if "final" in dir(agent):
+            if hasattr(agent, 'final'):
                 try:
                     self.mute(agentIndex)
                     agent.final(self.state)
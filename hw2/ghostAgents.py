@@ -55,7 +55,11 @@ class DirectionalGhost(GhostAgent):
         self.prob_attack = prob_attack
         self.prob_scaredFlee = prob_scaredFlee
 
-    def getDistribution(self, state):
+    def getBestActions(self, state):
+        """
+        Returns (legalActions, bestActions, isScared), where bestActions are
+        the legal actions that rush Pacman, or flee him when scared.
+        """
         # Read variables from state
         ghostState = state.getGhostState(self.index)
         legalActions = state.getLegalActions(self.index)
@@ -76,12 +80,18 @@ class DirectionalGhost(GhostAgent):
             pos, pacmanPosition) for pos in newPositions]
         if isScared:
             bestScore = max(distancesToPacman)
-            bestProb = self.prob_scaredFlee
         else:
             bestScore = min(distancesToPacman)
-            bestProb = self.prob_attack
         bestActions = [action for action, distance in zip(
             legalActions, distancesToPacman) if distance == bestScore]
+        return legalActions, bestActions, isScared
+
+    def getDistribution(self, state):
+        legalActions, bestActions, isScared = self.getBestActions(state)
+        if isScared:
+            bestProb = self.prob_scaredFlee
+        else:
+            bestProb = self.prob_attack
 
         # Construct distribution
         dist = util.Counter()
@@ -91,3 +101,43 @@ class DirectionalGhost(GhostAgent):
             dist[a] += (1-bestProb) / len(legalActions)
         dist.normalize()
         return dist
+
+
+class LearnedGhost(DirectionalGhost):
+    """
+    A model of a ghost of unknown type, for agents that search over ghost
+    moves.  Like a DirectionalGhost it favors the moves that rush Pacman (or
+    flee him when scared), but the probability of picking one of them is
+    estimated from the moves the ghost has been observed to make.  The
+    estimate starts from a uniform prior worth `prior` observations.
+    """
+
+    def __init__(self, index, prior=2.0):
+        self.index = index
+        self.prior = float(prior)
+        self.chosen = util.Counter()
+        self.observed = util.Counter()
+
+    def observe(self, state, action):
+        "Records that the ghost took action in state."
+        legalActions, bestActions, isScared = self.getBestActions(state)
+        if action not in legalActions or len(bestActions) == len(legalActions):
+            return
+        self.observed[isScared] += 1
+        if action in bestActions:
+            self.chosen[isScared] += 1
+
+    def getDistribution(self, state):
+        legalActions, bestActions, isScared = self.getBestActions(state)
+        uniform = float(len(bestActions)) / len(legalActions)
+        bestProb = (self.chosen[isScared] + self.prior * uniform) / \
+            (self.observed[isScared] + self.prior)
+
+        dist = util.Counter()
+        for a in legalActions:
+            if a in bestActions:
+                dist[a] = bestProb / len(bestActions)
+            elif bestProb < 1:
+                dist[a] = (1 - bestProb) / (len(legalActions) - len(bestActions))
+        dist.normalize()
+        return dist
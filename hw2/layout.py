@@ -14,11 +14,36 @@
 
 from util import manhattanDistance
 from game import Grid
+from game import Actions
+from array import array
+import hashlib
+import mmap
 import os
 import random
-from functools import reduce
+import struct
+import sys
 
-VISIBILITY_MATRIX_CACHE = {}
+LAYOUT_REGISTRY = {}
+LAYOUT_FILE_CACHE = {}
+COMPILED_LAYOUT_CACHE = {}
+
+
+def compiledLayoutDir():
+    """
+    Where compiled layouts are kept between runs: $PACMAN_LAYOUT_CACHE if
+    it is set (to an empty string to keep them in memory only), otherwise
+    pacman-layouts in the user's cache directory.
+    """
+    if 'PACMAN_LAYOUT_CACHE' in os.environ:
+        return os.environ['PACMAN_LAYOUT_CACHE'] or None
+    cacheHome = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cacheHome, 'pacman-layouts')
+
+
+# Where compiled layouts are kept between runs (None keeps them in memory)
+COMPILED_LAYOUT_DIR = compiledLayoutDir()
+DIRECTION_INDEX = dict((direction, i) for i, (direction, vec)
+                       in enumerate(Actions._directionsAsList))
 
 
 class Layout:
@@ -37,34 +62,59 @@ class Layout:
         self.processLayoutText(layoutText)
         self.layoutText = layoutText
         self.totalFood = len(self.food.asList())
-        # self.initializeVisibilityMatrix()
+        self.mazeDistances = None
+        self.hash = None
+        self.compiled = None  # see getCompiled
+        self.visibility = None  # see initializeVisibilityMatrix
 
     def getNumGhosts(self):
         return self.numGhosts
 
+    def getHash(self):
+        """
+        Returns a hex digest of the layout text, which identifies the layout
+        (in recorded games, for instance).
+        """
+        if self.hash is None:
+            self.hash = hashlib.sha1(str(self).encode('utf-8')).hexdigest()
+        return self.hash
+
+    def getCompiled(self):
+        "Returns the CompiledLayout of this layout (see getCompiledLayout)"
+        if self.compiled is None:
+            self.compiled = getCompiledLayout(self)
+        return self.compiled
+
+    def getMazeDistances(self):
+        """
+        Returns the MazeDistances of this layout, read from its compiled
+        layout.
+        """
+        if self.mazeDistances is None:
+            self.mazeDistances = self.getCompiled().getMazeDistances()
+        return self.mazeDistances
+
     def initializeVisibilityMatrix(self):
-        global VISIBILITY_MATRIX_CACHE
-        if reduce(str.__add__, self.layoutText) not in VISIBILITY_MATRIX_CACHE:
-            from game import Directions
-            vecs = [(-0.5, 0), (0.5, 0), (0, -0.5), (0, 0.5)]
-            dirs = [Directions.NORTH, Directions.SOUTH,
-                    Directions.WEST, Directions.EAST]
-            vis = Grid(self.width, self.height, {Directions.NORTH: set(), Directions.SOUTH: set(
-            ), Directions.EAST: set(), Directions.WEST: set(), Directions.STOP: set()})
-            for x in range(self.width):
-                for y in range(self.height):
-                    if self.walls[x][y] == False:
-                        for vec, direction in zip(vecs, dirs):
-                            dx, dy = vec
-                            nextx, nexty = x + dx, y + dy
-                            while (nextx + nexty) != int(nextx) + int(nexty) or not self.walls[int(nextx)][int(nexty)]:
-                                vis[x][y][direction].add((nextx, nexty))
-                                nextx, nexty = x + dx, y + dy
-            self.visibility = vis
-            VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)] = vis
-        else:
-            self.visibility = VISIBILITY_MATRIX_CACHE[reduce(
-                str.__add__, self.layoutText)]
+        """
+        Builds self.visibility, a Grid giving for each open cell and each
+        direction the set of positions, in half steps, that Pacman can see
+        straight ahead.  The sight lines come from the compiled layout,
+        which isVisibleFrom reads directly; the matrix is for code that
+        indexes visibility[x][y][direction].
+        """
+        compiled = self.getCompiled()
+        visibility = Grid(self.width, self.height, False)
+        for x in range(self.width):
+            for y in range(self.height):
+                cell = {}
+                for direction, (dx, dy) in Actions._directionsAsList:
+                    cell[direction] = set()
+                    if not self.walls[x][y] and (dx, dy) != (0, 0):
+                        sightLine = compiled.getSightLine((x, y), direction)
+                        cell[direction].update((x + dx * half / 2.0, y + dy * half / 2.0)
+                                               for half in range(1, 2 * sightLine + 2))
+                visibility[x][y] = cell
+        self.visibility = visibility
 
     def isWall(self, pos):
         x, col = pos
@@ -90,14 +140,34 @@ class Layout:
         return pos
 
     def isVisibleFrom(self, ghostPos, pacPos, pacDirection):
+        """
+        Whether Pacman, at pacPos facing pacDirection, can see a ghost at
+        ghostPos: anywhere straight ahead (in half steps) short of the
+        first wall.
+        """
         row, col = [int(x) for x in pacPos]
-        return ghostPos in self.visibility[row][col][pacDirection]
+        dx, dy = Actions._directions[pacDirection]
+        ghostX, ghostY = ghostPos
+        if dx != 0 and ghostY == col:
+            ahead = (ghostX - row) * dx
+        elif dy != 0 and ghostX == row:
+            ahead = (ghostY - col) * dy
+        else:
+            return False
+        sightLine = self.getCompiled().getSightLine((row, col), pacDirection)
+        return 0 < ahead < sightLine + 1 and ahead * 2 == int(ahead * 2)
 
     def __str__(self):
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        "Layouts never change during a game, so copies share this one"
+        return self
+
+    def __reduce__(self):
+        # Pickle only the text, so that unpickling (in a worker process, say)
+        # resolves to that process's interned layout
+        return (internLayout, (self.layoutText,))
 
     def processLayoutText(self, layoutText):
         """
@@ -137,7 +207,341 @@ class Layout:
             self.numGhosts += 1
 
 
+class MazeDistances:
+    """
+    Shortest path distances through a maze between every pair of open cells,
+    found by a breadth-first search from each cell.
+
+    Cells are numbered in column order.  The distances are stored in one
+    flat array with a row per cell, next to a second array that lists the
+    cells of each row from nearest to farthest (the BFS visiting order), so
+    the nearest cell holding food takes only as many lookups as there are
+    closer cells without any.
+    """
+    UNREACHABLE = 65535
+
+    def __init__(self, walls, distances=None, nearest=None):
+        """
+        Runs the searches, unless the two arrays (or memoryviews of them)
+        are given.
+        """
+        self.cells = walls.asList(False)
+        self.cellIndex = dict((cell, i) for i, cell in enumerate(self.cells))
+        n = self.numCells = len(self.cells)
+        if distances is not None:
+            self.distances, self.nearest = distances, nearest
+            return
+        neighbors = [[self.cellIndex[neighbor] for neighbor in Actions.getLegalNeighbors(cell, walls)
+                      if neighbor != cell] for cell in self.cells]
+
+        self.distances = array('H', [self.UNREACHABLE]) * (n * n)
+        self.nearest = array('H', [0]) * (n * n)
+        distances, nearest = self.distances, self.nearest
+        for source in range(n):
+            row = source * n
+            distances[row + source] = 0
+            nearest[row] = source
+            visited = 1
+            frontier = 0
+            while frontier < visited:
+                cell = nearest[row + frontier]
+                frontier += 1
+                dist = distances[row + cell] + 1
+                for neighbor in neighbors[cell]:
+                    if distances[row + neighbor] == self.UNREACHABLE:
+                        distances[row + neighbor] = dist
+                        nearest[row + visited] = neighbor
+                        visited += 1
+            # Unreachable cells end the row
+            for cell in range(n):
+                if distances[row + cell] == self.UNREACHABLE:
+                    nearest[row + visited] = cell
+                    visited += 1
+
+    def _points(self, pos):
+        """
+        Returns (cell number, offset) pairs for the grid points next to pos.
+        Agents between grid points (scared ghosts) are half a step from two.
+        """
+        x, y = pos
+        ix, iy = int(x), int(y)
+        if x == ix and y == iy:
+            return ((self.cellIndex[(ix, iy)], 0),)
+        points = []
+        for cell in set([(ix, iy), (int(x + 0.5), int(y + 0.5))]):
+            if cell in self.cellIndex:
+                points.append((self.cellIndex[cell], manhattanDistance(cell, pos)))
+        return points
+
+    def getDistance(self, pos1, pos2):
+        """
+        Returns the maze distance between two positions, or None if one
+        cannot be reached from the other.
+        """
+        n = self.numCells
+        best = self.UNREACHABLE
+        for cell1, offset1 in self._points(pos1):
+            for cell2, offset2 in self._points(pos2):
+                dist = self.distances[cell1 * n + cell2]
+                if dist != self.UNREACHABLE:
+                    best = min(best, dist + offset1 + offset2)
+        if best == self.UNREACHABLE:
+            return None
+        return best
+
+    def getNearest(self, pos, grid):
+        """
+        Returns the maze distance from the grid point pos to the nearest
+        cell that is True in grid (such as a food Grid), or None if there is
+        no such reachable cell.
+        """
+        n = self.numCells
+        row = self.cellIndex[pos] * n
+        cells, distances, nearest = self.cells, self.distances, self.nearest
+        for k in range(row, row + n):
+            cell = nearest[k]
+            x, y = cells[cell]
+            if grid[x][y]:
+                dist = distances[row + cell]
+                if dist == self.UNREACHABLE:
+                    return None
+                return dist
+        return None
+
+
+class CompiledLayout:
+    """
+    The static analysis of a maze, worked out once per layout text and kept
+    on disk (see getCompiledLayout), from where it is memory-mapped rather
+    than read, so that processes share the pages.
+
+      walls       bitset of the walls, bit x * height + y
+      cells       the open cells, in column order
+      legalMoves  for each open cell, a bitmask of the actions that don't
+                  run into a wall, bit i standing for
+                  Actions._directionsAsList[i]
+      corridors   for each open cell, the number of the corridor it lies
+                  in, where a corridor is a run of cells with exactly two
+                  open neighbors; otherwise CORRIDOR_DEAD_END (one open
+                  neighbor) or CORRIDOR_JUNCTION
+      sightLines  for each open cell and each direction of
+                  Actions._directionsAsList, the number of open cells in a
+                  row before the first wall (0 for Stop), at
+                  cell * 5 + direction
+      distances   the MazeDistances arrays
+      nearest
+
+    The arrays are memoryviews in machine byte order.
+    """
+    MAGIC = b'PMLC'
+    VERSION = 2
+    HEADER = struct.Struct('<4sBcHHII')
+    CORRIDOR_DEAD_END = -1
+    CORRIDOR_JUNCTION = -2
+
+    def __init__(self, data):
+        """
+        Reads a compiled layout from a buffer (such as an mmap) holding the
+        output of compileLayout.
+        """
+        magic, version, byteOrder, width, height, numCells, numCorridors = \
+            self.HEADER.unpack_from(data, 0)
+        if magic != self.MAGIC or version != self.VERSION or byteOrder != self.byteOrder():
+            raise ValueError('Not a compiled layout for this machine')
+        self.data = data
+        self.width, self.height = width, height
+        self.numCells, self.numCorridors = numCells, numCorridors
+        view = memoryview(data)
+        sections = []
+        offset = self.HEADER.size
+        for size, typecode in self.sectionSizes(width, height, numCells):
+            sections.append(view[offset:offset + size].cast(typecode))
+            offset += size
+        self.wallBits, self.cells, self.legalMoves, self.corridors, \
+            self.sightLines, self.distances, self.nearest = sections
+        self.mazeDistances = None
+
+    def byteOrder():
+        return {'little': b'<', 'big': b'>'}[sys.byteorder]
+    byteOrder = staticmethod(byteOrder)
+
+    def sectionSizes(width, height, numCells):
+        """
+        The (size in bytes, typecode) of each section, in file order; the
+        byte sections are padded to keep the arrays after them aligned.
+        """
+        wallBytes = (width * height + 15) // 16 * 2
+        return [(wallBytes, 'B'), (2 * numCells, 'H'), ((numCells + 1) // 2 * 2, 'B'),
+                (2 * numCells, 'h'), (10 * numCells, 'H'), (2 * numCells * numCells, 'H'),
+                (2 * numCells * numCells, 'H')]
+    sectionSizes = staticmethod(sectionSizes)
+
+    def isWall(self, pos):
+        x, y = pos
+        bit = x * self.height + y
+        return bool(self.wallBits[bit >> 3] >> (bit & 7) & 1)
+
+    def getCellIndex(self, pos):
+        """
+        The number of an open cell (its position in cells), found by
+        bisection since cells are sorted.
+        """
+        x, y = pos
+        code = x * self.height + y
+        lo, hi = 0, self.numCells
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.cells[mid] < code:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def getLegalActions(self, pos):
+        "Actions that don't run into a wall from the grid point pos"
+        moves = self.legalMoves[self.getCellIndex(pos)]
+        return [direction for i, (direction, vec) in enumerate(Actions._directionsAsList)
+                if moves >> i & 1]
+
+    def getCorridor(self, pos):
+        return self.corridors[self.getCellIndex(pos)]
+
+    def getSightLine(self, pos, direction):
+        "How many open cells lie straight ahead of pos before the first wall"
+        return self.sightLines[self.getCellIndex(pos) * 5 + DIRECTION_INDEX[direction]]
+
+    def getWalls(self):
+        walls = Grid(self.width, self.height, False)
+        for x in range(self.width):
+            for y in range(self.height):
+                walls[x][y] = self.isWall((x, y))
+        return walls
+
+    def getMazeDistances(self):
+        if self.mazeDistances is None:
+            self.mazeDistances = MazeDistances(self.getWalls(), self.distances, self.nearest)
+        return self.mazeDistances
+
+
+def compileLayout(layout):
+    """
+    Works out the static analysis of the layout's maze and returns it in
+    the format read by CompiledLayout.
+    """
+    width, height, walls = layout.width, layout.height, layout.walls
+    distances = MazeDistances(walls)
+    cells = distances.cells
+    n = len(cells)
+
+    wallBits = bytearray(CompiledLayout.sectionSizes(width, height, n)[0][0])
+    for x, y in walls.asList():
+        bit = x * height + y
+        wallBits[bit >> 3] |= 1 << (bit & 7)
+    cellCodes = array('H', [x * height + y for x, y in cells])
+    legalMoves = bytearray(CompiledLayout.sectionSizes(width, height, n)[2][0])
+    neighbors = []
+    for i, (x, y) in enumerate(cells):
+        for bit, (direction, (dx, dy)) in enumerate(Actions._directionsAsList):
+            if not walls[x + dx][y + dy]:
+                legalMoves[i] |= 1 << bit
+        neighbors.append([distances.cellIndex[neighbor] for neighbor in
+                          Actions.getLegalNeighbors((x, y), walls) if neighbor != (x, y)])
+
+    # Number the runs of cells with two open neighbors
+    corridors = array('h', [CompiledLayout.CORRIDOR_JUNCTION]) * n
+    numCorridors = 0
+    for i in range(n):
+        if len(neighbors[i]) == 1:
+            corridors[i] = CompiledLayout.CORRIDOR_DEAD_END
+        elif len(neighbors[i]) == 2 and corridors[i] == CompiledLayout.CORRIDOR_JUNCTION:
+            corridors[i] = numCorridors
+            stack = [i]
+            while stack:
+                for neighbor in neighbors[stack.pop()]:
+                    if len(neighbors[neighbor]) == 2 and \
+                            corridors[neighbor] == CompiledLayout.CORRIDOR_JUNCTION:
+                        corridors[neighbor] = numCorridors
+                        stack.append(neighbor)
+            numCorridors += 1
+
+    # March a ray from each cell in each direction, reusing the ray of the
+    # next cell along (so cells are visited farthest along the ray first)
+    sightLines = array('H', [0]) * (5 * n)
+    for d, (direction, (dx, dy)) in enumerate(Actions._directionsAsList):
+        if (dx, dy) == (0, 0):
+            continue
+        for x, y in sorted(cells, key=lambda cell: -(cell[0] * dx + cell[1] * dy)):
+            if not walls[x + dx][y + dy]:
+                ahead = distances.cellIndex[(x + dx, y + dy)]
+                sightLines[distances.cellIndex[(x, y)] * 5 + d] = sightLines[ahead * 5 + d] + 1
+
+    header = CompiledLayout.HEADER.pack(CompiledLayout.MAGIC, CompiledLayout.VERSION,
+                                        CompiledLayout.byteOrder(), width, height, n, numCorridors)
+    return b''.join([header, bytes(wallBits), cellCodes.tobytes(), bytes(legalMoves),
+                     corridors.tobytes(), sightLines.tobytes(), distances.distances.tobytes(),
+                     distances.nearest.tobytes()])
+
+
+def getCompiledLayout(layout):
+    """
+    Returns the CompiledLayout of the layout: compiled once per layout text
+    and saved in COMPILED_LAYOUT_DIR under the layout's hash, from where
+    later runs and other processes map it.  If the directory cannot be
+    written to, the layout is compiled in memory, once per process.
+    """
+    key = layout.getHash()
+    if key in COMPILED_LAYOUT_CACHE:
+        return COMPILED_LAYOUT_CACHE[key]
+    compiled = None
+    if COMPILED_LAYOUT_DIR is not None:
+        fname = os.path.join(COMPILED_LAYOUT_DIR, key + '.bin')
+        try:
+            f = open(fname, 'rb')
+            try:
+                compiled = CompiledLayout(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            finally:
+                f.close()
+        except (IOError, OSError, ValueError, struct.error):
+            # Missing, unreadable or stale: compile it again
+            compiled = None
+    if compiled is None:
+        data = compileLayout(layout)
+        compiled = CompiledLayout(data)
+        if COMPILED_LAYOUT_DIR is not None:
+            try:
+                if not os.path.isdir(COMPILED_LAYOUT_DIR):
+                    os.makedirs(COMPILED_LAYOUT_DIR)
+                # Written under another name and renamed, so that no process
+                # maps a half-written file
+                tmpName = '%s.%d.tmp' % (fname, os.getpid())
+                f = open(tmpName, 'wb')
+                try:
+                    f.write(data)
+                finally:
+                    f.close()
+                os.replace(tmpName, fname)
+            except (IOError, OSError):
+                pass
+    COMPILED_LAYOUT_CACHE[key] = compiled
+    return compiled
+
+
 def getLayout(name, back=2):
+    """
+    Finds and loads the layout file called name, looking in layouts/ and
+    the current directory, then in up to back directories above.  Each name
+    is looked up once per working directory.
+    """
+    key = (os.path.abspath('.'), name, back)
+    if key not in LAYOUT_FILE_CACHE:
+        layout = findLayout(name, back)
+        if layout is None:
+            return None
+        LAYOUT_FILE_CACHE[key] = layout
+    return LAYOUT_FILE_CACHE[key]
+
+
+def findLayout(name, back=2):
     if name.endswith('.lay'):
         layout = tryToLoad('layouts/' + name)
         if layout == None:
@@ -149,7 +553,7 @@ def getLayout(name, back=2):
     if layout == None and back >= 0:
         curdir = os.path.abspath('.')
         os.chdir('..')
-        layout = getLayout(name, back - 1)
+        layout = findLayout(name, back - 1)
         os.chdir(curdir)
     return layout
 
@@ -159,6 +563,19 @@ def tryToLoad(fullname):
         return None
     f = open(fullname)
     try:
-        return Layout([line.strip() for line in f])
+        return internLayout([line.strip() for line in f])
     finally:
         f.close()
+
+
+def internLayout(layoutText):
+    """
+    Returns the Layout of the given text, parsing each distinct text only
+    once per process.  The Layout is shared by every game and state that
+    uses it, along with its cached maze distances, so it must be treated
+    as read-only.
+    """
+    key = hashlib.sha1('\n'.join(layoutText).encode('utf-8')).hexdigest()
+    if key not in LAYOUT_REGISTRY:
+        LAYOUT_REGISTRY[key] = Layout(list(layoutText))
+    return LAYOUT_REGISTRY[key]
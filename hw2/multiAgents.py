@@ -17,6 +17,7 @@ from game import Directions
 import random, util
 
 from game import Agent
+import ghostAgents
 
 class ReflexAgent(Agent):
     """
@@ -110,6 +111,46 @@ def scoreEvaluationFunction(currentGameState):
     """
     return currentGameState.getScore()
 
+def scoreBounds(currentGameState, depth):
+    """
+    Returns (lower, upper) bounds on the score of any state reachable from
+    currentGameState within depth Pacman moves and the ghost moves between
+    them, following the scoring rules in pacman.py: each Pacman move costs
+    1 point, food is worth 10, clearing the board 500, eating a scared ghost
+    200 and dying costs 500.
+
+    Pacman can only eat food and capsules within depth steps, and can only
+    meet ghosts within 2 * depth steps (both sides move).  A ghost can be
+    eaten once if it is scared now, and once more for every capsule eaten.
+    """
+    depth = max(depth, 1)
+    score = currentGameState.getScore()
+    pos = currentGameState.getPacmanPosition()
+    foodList = currentGameState.getFood().asList()
+    foodReach = len([food for food in foodList if manhattanDistance(pos, food) <= depth])
+    capsuleReach = len([capsule for capsule in currentGameState.getCapsules() if manhattanDistance(pos, capsule) <= depth])
+    capsuleReach = min(depth, capsuleReach)
+
+    ghostsEaten = 0
+    canLose = False
+    for ghostState in currentGameState.getGhostStates():
+        if manhattanDistance(pos, ghostState.getPosition()) <= 2 * depth + 1:
+            canLose = True
+            ghostsEaten += capsuleReach + (1 if ghostState.scaredTimer > 0 else 0)
+    canWin = len(foodList) <= depth and foodReach == len(foodList)
+
+    upper = score + 10 * min(depth, foodReach) + 200 * ghostsEaten
+    if canWin:
+        upper += 500
+    # Unless the game can end early, every Pacman move pays the time penalty
+    upper -= 1 if canWin or canLose else depth
+    lower = score - depth
+    if canLose:
+        lower -= 500
+    return lower, upper
+
+scoreEvaluationFunction.bounds = scoreBounds
+
 class MultiAgentSearchAgent(Agent):
     """
     This class provides some common elements to all of your
@@ -300,55 +341,321 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
         # Return the action with the highest score
         return legalMoves[scores.index(max(scores))]
 
+class StarExpectimaxAgent(ExpectimaxAgent):
+    """
+    Expectimax with Star1/Star2 chance-node pruning (Ballard, 1983).
+
+    Chance nodes are searched with an alpha-beta window using the lower and
+    upper bounds that the evaluation function declares through its `bounds`
+    attribute (see scoreBounds).  A chance node is cut off as soon as
+    its expected value is known to fall outside the window.  With star=2,
+    each Pacman child of a chance node is first probed on its first move to
+    get cheap lower bounds before the full search.
+
+    Chooses the same moves as ExpectimaxAgent, while expanding fewer nodes.
+    Evaluation functions without declared bounds are searched without
+    chance-node pruning.
+    """
+
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2', star = '1'):
+        MultiAgentSearchAgent.__init__(self, evalFn, depth)
+        self.star = int(star)
+        self.nodesExpanded = 0
+
+    def getAction(self, gameState):
+        """
+        Returns the expectimax action using self.depth and self.evaluationFunction
+        """
+        bounds = getattr(self.evaluationFunction, 'bounds', None)
+        if bounds is None:
+            self.lower, self.upper = float('-inf'), float('inf')
+        else:
+            self.lower, self.upper = bounds(gameState, self.depth)
+
+        # Only strictly better actions replace the best one, which keeps the
+        # first of several tied actions, like ExpectimaxAgent does
+        bestScore = float('-inf')
+        bestAction = None
+        for action in gameState.getLegalActions(0):
+            alpha = max(bestScore, self.lower)
+            score = self.search(gameState.generateSuccessor(0, action), 1, self.depth, alpha, self.upper)
+            if score > bestScore:
+                bestScore = score
+                bestAction = action
+        return bestAction
+
+    def getChanceOutcomes(self, state, index, legalMoves):
+        """
+        Returns a list of (action, weight) pairs giving the (unnormalized)
+        weight of each ghost move searched.  Ghosts are modeled as choosing
+        uniformly at random from their legal moves.
+        """
+        return [(action, 1.0) for action in legalMoves]
+
+    def search(self, state, index, depth, alpha, beta, firstValue = None):
+        """
+        Fail-soft search of state: the returned value is exact if it lies
+        strictly inside (alpha, beta), an upper bound if it is <= alpha and a
+        lower bound if it is >= beta.  firstValue is the already probed value
+        of Pacman's first legal move, which is then not searched again.
+        """
+        self.nodesExpanded += 1
+        if state.isWin() or state.isLose() or depth == 0:
+            return self.evaluationFunction(state)
+
+        legalMoves = state.getLegalActions(index)
+        if not legalMoves:
+            return self.evaluationFunction(state)
+
+        nextAgent = (index + 1) % state.getNumAgents()
+        nextDepth = depth - 1 if nextAgent == 0 else depth
+
+        if index == 0:
+            value = float('-inf')
+            if firstValue is not None:
+                value = firstValue
+                legalMoves = legalMoves[1:]
+            for action in legalMoves:
+                if value >= beta:
+                    break
+                value = max(value, self.search(state.generateSuccessor(index, action), nextAgent, nextDepth, max(alpha, value), beta))
+            return value
+
+        outcomes = self.getChanceOutcomes(state, index, legalMoves)
+        successors = [state.generateSuccessor(index, action) for action, weight in outcomes]
+        weights = [weight for action, weight in outcomes]
+        if self.upper == float('inf'):
+            # Unbounded evaluation: nothing can be cut off
+            total = sum(weights)
+            return sum(weight * self.search(successor, nextAgent, nextDepth, self.lower, self.upper)
+                       for successor, weight in zip(successors, weights)) / total
+        probes = [None for successor in successors]
+        if self.star >= 2 and nextAgent == 0 and nextDepth > 0:
+            cutoff = self.probe(successors, weights, probes, nextDepth, beta)
+            if cutoff is not None:
+                return cutoff
+        return self.chance(successors, weights, probes, nextAgent, nextDepth, alpha, beta)
+
+    def chance(self, successors, weights, probes, nextAgent, nextDepth, alpha, beta):
+        """
+        Star1 search of a chance node.  probes holds the probed value of the
+        first move of each successor (None if it was not probed), which
+        bounds the successor's value from below.
+        """
+        total = sum(weights)
+        alphaTotal = alpha * total
+        betaTotal = beta * total
+        lowers = [self.lower if probe is None else probe for probe in probes]
+
+        # weighted sum of the searched successors, and the weight and lower
+        # bound of the rest
+        searched = 0.0
+        remaining = total
+        remainingLower = sum(w * l for w, l in zip(weights, lowers))
+        for successor, weight, lower, probe in zip(successors, weights, lowers, probes):
+            remaining -= weight
+            remainingLower -= weight * lower
+            childAlpha = (alphaTotal - searched - remaining * self.upper) / weight
+            childBeta = (betaTotal - searched - remainingLower) / weight
+            value = self.search(successor, nextAgent, nextDepth, max(childAlpha, self.lower), min(childBeta, self.upper), probe)
+            # Clamping to the window guards the cutoffs against rounding
+            if value <= childAlpha:
+                return min((searched + weight * value + remaining * self.upper) / total, alpha)
+            if value >= childBeta:
+                return max((searched + weight * value + remainingLower) / total, beta)
+            searched += weight * value
+        return searched / total
+
+    def probe(self, successors, weights, probes, nextDepth, beta):
+        """
+        Star2 probing phase: bounds each Pacman successor from below by
+        searching only its first move, storing the values in probes.  Returns
+        a value >= beta if the probes alone cut the chance node off, and None
+        otherwise.
+        """
+        total = sum(weights)
+        betaTotal = beta * total
+        probed = 0.0
+        remainingLower = total * self.lower
+        for i, (successor, weight) in enumerate(zip(successors, weights)):
+            remainingLower -= weight * self.lower
+            if successor.isWin() or successor.isLose():
+                probed += weight * self.lower
+                continue
+            legalMoves = successor.getLegalActions(0)
+            if not legalMoves:
+                probed += weight * self.lower
+                continue
+            childBeta = (betaTotal - probed - remainingLower) / weight
+            childAgent = 1 % successor.getNumAgents()
+            childDepth = nextDepth - 1 if childAgent == 0 else nextDepth
+            # The probe window starts at self.lower, so unless it cuts off the
+            # returned value is the exact value of the first move
+            value = self.search(successor.generateSuccessor(0, legalMoves[0]), childAgent, childDepth,
+                                self.lower, min(childBeta, self.upper))
+            if value >= childBeta:
+                return max((probed + weight * value + remainingLower) / total, beta)
+            probes[i] = value
+            probed += weight * value
+        return None
+
+class ModelExpectimaxAgent(StarExpectimaxAgent):
+    """
+    An expectimax agent that weights each ghost's moves by a ghost model:
+    any ghost agent class from ghostAgents.py, whose getDistribution gives
+    the chance of each move.  RandomGhost models uniform ghosts,
+    DirectionalGhost the ghosts that rush Pacman, and LearnedGhost fits
+    each ghost's behavior from the moves it is seen to make in the game.
+
+    Ghost moves whose probability is below threshold are not searched (the
+    rest are renormalized), which lets the agent search deeper in the same
+    time.  Chance nodes are pruned as in StarExpectimaxAgent.
+    """
+
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2', ghostModel = 'DirectionalGhost',
+                 threshold = '0', star = '1'):
+        StarExpectimaxAgent.__init__(self, evalFn, depth, star)
+        self.ghostModel = getattr(ghostAgents, ghostModel)
+        self.threshold = float(threshold)
+        self.ghostModels = None
+
+    def registerInitialState(self, gameState):
+        # Models are kept from game to game, so learned models keep learning
+        if self.ghostModels is None or len(self.ghostModels) != gameState.getNumAgents():
+            self.ghostModels = [self.ghostModel(index) for index in range(gameState.getNumAgents())]
+        self.lastState = None
+        self.lastAction = None
+
+    def getAction(self, gameState):
+        """
+        Returns the expectimax action using self.depth and self.evaluationFunction
+        """
+        if self.ghostModels is None:
+            self.registerInitialState(gameState)
+        self.observeGhosts(gameState)
+        action = StarExpectimaxAgent.getAction(self, gameState)
+        self.lastState = gameState
+        self.lastAction = action
+        return action
+
+    def observeGhosts(self, gameState):
+        """
+        Replays the ghost moves made since our last move, which can be read
+        off the ghosts' directions in gameState, so that learning ghost
+        models can observe each move in the state it was made from.
+        """
+        if self.lastState is None:
+            return
+        state = self.lastState.generateSuccessor(0, self.lastAction)
+        for index in range(1, gameState.getNumAgents()):
+            if state.isWin() or state.isLose():
+                return
+            action = gameState.getGhostState(index).getDirection()
+            if action not in state.getLegalActions(index):
+                # The ghost was eaten and sent home
+                return
+            model = self.ghostModels[index]
+            if hasattr(model, 'observe'):
+                model.observe(state, action)
+            state = state.generateSuccessor(index, action)
+
+    def getChanceOutcomes(self, state, index, legalMoves):
+        """
+        Returns the ghost moves with probability at least self.threshold,
+        weighted by the ghost model.  The most likely move is always kept.
+        """
+        dist = self.ghostModels[index].getDistribution(state)
+        outcomes = [(action, dist[action]) for action in legalMoves if dist[action] > 0]
+        likely = [(action, weight) for action, weight in outcomes if weight >= self.threshold]
+        if not likely:
+            likely = [max(outcomes, key=lambda outcome: outcome[1])]
+        return likely
+
+def evaluationFeatures(currentGameState):
+    """
+    Returns the features that betterEvaluationFunction combines:
+
+    (nearest food distance, number of food pellets,
+     [(ghost distance, ghost scared timer) for each ghost])
+
+    The food distance is a maze distance looked up in the layout's
+    MazeDistances, which takes a handful of table lookups instead of a pass
+    over all the food (it is None once the food is gone).  Ghost distances
+    are Manhattan distances: these never exceed the maze distance, which
+    keeps Pacman wary of a ghost just behind a wall.
+    """
+    pos = currentGameState.getPacmanPosition()
+
+    numFood = currentGameState.getNumFood()
+    nearestFood = None
+    if numFood:
+        nearestFood = currentGameState.getMazeDistances().getNearest(pos, currentGameState.getFood())
+    ghosts = [(manhattanDistance(pos, ghostState.getPosition()), ghostState.scaredTimer)
+              for ghostState in currentGameState.getGhostStates()]
+    return nearestFood, numFood, ghosts
+
 def betterEvaluationFunction(currentGameState):
     """
     Your extreme ghost-hunting, pellet-nabbing, food-gobbling, unstoppable
     evaluation function (question 5).
 
-    DESCRIPTION: <write something here so we know what you did>
+    DESCRIPTION: the game score, plus a reward for being near food and near
+    scared ghosts, minus a penalty for being near active ghosts and for
+    every pellet left (see evaluationFeatures).
     """
     "*** YOUR CODE HERE ***"
-    # Useful information you can extract from a GameState (pacman.py)
-    pos = currentGameState.getPacmanPosition()
-    food = currentGameState.getFood()
-    ghostStates = currentGameState.getGhostStates()
-    scaredTimes = [ghostState.scaredTimer for ghostState in ghostStates]
-    
+    minFoodDist, numFood, ghosts = evaluationFeatures(currentGameState)
+    if minFoodDist is None:
+        minFoodDist = 1
+
     # Start with game score
     score = currentGameState.getScore()
-    
-    # Distance to the nearest food
-    foodList = food.asList()
-    
-    if foodList:
-        minFoodDist = min([manhattanDistance(pos, foodPos) for foodPos in foodList])
-    else:
-        minFoodDist = 1
-    
+
     # Calculate ghost proximity
     ghostPenalty = 0
-    
-    for ghostState in ghostStates:
-        ghostPos = ghostState.getPosition()
-        dist = manhattanDistance(pos, ghostPos)
-        
-        if ghostState.scaredTimer > 0:
+
+    for dist, scaredTimer in ghosts:
+        if scaredTimer > 0:
             # Reward being close to scared ghosts
             ghostPenalty += 200 / (dist + 1)
-        
+
         else:
             # Penalize being too close to active ghosts
             ghostPenalty -= 500 / (dist + 1)
-    
-    # Penalize for remaining food
-    remainingFoodPenalty = len(foodList)
-    
+
     # Combine the features
     score += (1.0 / (minFoodDist + 1)) * 10
     score += ghostPenalty
-    score -= remainingFoodPenalty * 10
+    score -= numFood * 10
 
     return score
 
+def betterBounds(currentGameState, depth):
+    """
+    Bounds on betterEvaluationFunction over the states reachable within
+    depth Pacman moves (see scoreBounds).  The food distance term lies in
+    (0, 5], at most depth pellets can be eaten, and each ghost term is
+    bounded by how close that ghost can get to Pacman.  An eaten ghost
+    restarts from its start position.
+    """
+    lower, upper = scoreBounds(currentGameState, depth)
+    depth = max(depth, 1)
+    pos = currentGameState.getPacmanPosition()
+    numFood = currentGameState.getNumFood()
+    foodReach = len([food for food in currentGameState.getFood().asList() if manhattanDistance(pos, food) <= depth])
+
+    lower -= 10 * numFood
+    upper += 5 - 10 * (numFood - min(depth, foodReach))
+    for ghostState in currentGameState.getGhostStates():
+        dist = manhattanDistance(pos, ghostState.getPosition())
+        if dist <= 2 * depth + 1:
+            dist = min(dist, manhattanDistance(pos, ghostState.start.getPosition()))
+        closest = max(0, dist - 2 * depth)
+        lower -= 500 / (closest + 1)
+        upper += 200 / (closest + 1)
+    return lower, upper
+
+betterEvaluationFunction.bounds = betterBounds
+
 # Abbreviation
 better = betterEvaluationFunction
@@ -42,6 +42,9 @@ import autograder
 
 VERBOSE = False
 
+# Worker processes for the games of EvalAgentTest (autograder.py --parallel)
+PARALLEL = 0
+
 
 class MultiagentTreeState(object):
     def __init__(self, problem, state):
@@ -141,14 +144,17 @@ def parseTreeProblem(testDict):
     return MultiagentTreeProblem(numAgents, startState, winStates, loseStates, successors, evaluation)
 
 
-def run(lay, layName, pac, ghosts, disp, nGames=1, name='games'):
+def run(lay, layName, pac, ghosts, disp, nGames=1, name='games', parallel=0):
     """
-    Runs a few games and outputs their statistics.
+    Runs a few games and outputs their statistics.  With parallel > 0 the
+    games are played by that many worker processes (see pacman.runGames),
+    on copies of the agents, so agents that are inspected after the games
+    must be run with parallel=0.
     """
     starttime = time.time()
     print('*** Running %s on' % name, layName, '%d time(s).' % nGames)
     games = pacman.runGames(lay, pac, ghosts, disp,
-                            nGames, False, catchExceptions=True, timeout=120)
+                            nGames, False, catchExceptions=True, timeout=120, parallel=parallel)
     print('*** Finished running %s on' % name, layName,
           'after %d seconds.' % (time.time() - starttime))
     stats = {'time': time.time() - starttime, 'wins': [g.state.isWin() for g in games].count(True), 'games': games, 'scores': [g.state.getScore() for g in games],
@@ -510,7 +516,8 @@ class EvalAgentTest(testClasses.TestCase):
 
         random.seed(self.seed)
         games = pacman.runGames(lay, agent, self.ghosts, disp, self.numGames,
-                                False, catchExceptions=True, timeout=self.maxTime)
+                                False, catchExceptions=True, timeout=self.maxTime,
+                                parallel=PARALLEL)
         totalTime = time.time() - startTime
 
         stats = {'time': totalTime, 'wins': [g.state.isWin() for g in games].count(True),
@@ -576,3 +583,54 @@ class EvalAgentTest(testClasses.TestCase):
         handle.write('# File intentionally blank.\n')
         handle.close()
         return True
+
+
+class ObservationRecorder(Agent):
+    "Moves at random, keeping the food grid of every state it is handed"
+
+    def __init__(self, index=0):
+        Agent.__init__(self, index)
+        self.foodGrids = []
+
+    def getAction(self, state):
+        self.foodGrids.append(state.getFood())
+        return random.choice(state.getLegalActions(self.index))
+
+
+class SnapshotCopyTest(testClasses.TestCase):
+    """
+    Plays a headless game and counts the read-only food grids handed to
+    Pacman: a snapshot should copy the food only after some is eaten,
+    not on every move.
+    """
+
+    def __init__(self, question, testDict):
+        super(SnapshotCopyTest, self).__init__(question, testDict)
+        self.layoutName = testDict['layoutName']
+        self.ghosts = eval(testDict['ghosts'])
+        self.seed = int(testDict['randomSeed'])
+
+    def execute(self, grades, moduleDict, solutionDict):
+        import textDisplay
+        lay = layout.getLayout(self.layoutName, 3)
+        random.seed(self.seed)
+        recorder = ObservationRecorder()
+        rules = pacman.ClassicGameRules()
+        game = rules.newGame(lay, recorder, self.ghosts, textDisplay.NullGraphics(), quiet=True)
+        game.run()
+
+        moves = len(recorder.foodGrids)
+        copies = len(set(id(food) for food in recorder.foodGrids))
+        eaten = lay.food.count() - game.state.getNumFood()
+        self.addMessage('%d moves, %d food eaten, %d food grid copies' % (moves, eaten, copies))
+        if copies > eaten + 1:
+            self.addMessage('Snapshots copied the food grid on moves that ate nothing')
+            return self.testFail(grades)
+        return self.testPass(grades)
+
+    def writeSolution(self, moduleDict, filePath):
+        handle = open(filePath, 'w')
+        handle.write('# This is the solution file for %s.\n' % self.path)
+        handle.write('# File intentionally blank.\n')
+        handle.close()
+        return True
@@ -47,6 +47,7 @@ from util import nearestPoint
 from util import manhattanDistance
 import util
 import layout
+import recording
 import sys
 import types
 import time
@@ -78,6 +79,7 @@ class GameState:
     ####################################################
 
     # static variable keeps track of which states have had getLegalActions called
+    # (None turns the tracking off)
     explored = set()
 
     def getAndResetExplored():
@@ -129,8 +131,9 @@ class GameState:
         # Book keeping
         state.data._agentMoved = agentIndex
         state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
+        if GameState.explored is not None:
+            GameState.explored.add(self)
+            GameState.explored.add(state)
         return state
 
     def getLegalPacmanActions(self):
@@ -209,6 +212,17 @@ class GameState:
         """
         return self.data.layout.walls
 
+    def getMazeDistances(self):
+        """
+        Returns the MazeDistances of the board (see layout.py), for shortest
+        path distances through the maze:
+
+        distances = state.getMazeDistances()
+        distances.getDistance(pacmanPosition, ghostPosition)
+        distances.getNearest(pacmanPosition, state.getFood())
+        """
+        return self.data.layout.getMazeDistances()
+
     def hasFood(self, x, y):
         return self.data.food[x][y]
 
@@ -240,6 +254,12 @@ class GameState:
         state.data = self.data.deepCopy()
         return state
 
+    def snapshot(self):
+        "A cheap copy for read-only use; see GameStateData.snapshot"
+        state = GameState()
+        state.data = self.data.snapshot()
+        return state
+
     def __eq__(self, other):
         """
         Allows two states to be compared.
@@ -543,7 +563,9 @@ def readCommand(argv):
     parser.add_option('-r', '--recordActions', action='store_true', dest='record',
                       help='Writes game histories to a file (named by the time they were played)', default=False)
     parser.add_option('--replay', dest='gameToReplay',
-                      help='A recorded game file (pickle) to replay', default=None)
+                      help='A recorded game file to replay (on the layout given by -l)', default=None)
+    parser.add_option('--verifyRecordings', dest='recordingsToVerify',
+                      help='Replays the recorded games matching this file pattern without graphics, checking their final scores and outcomes', default=None)
     parser.add_option('-a', '--agentArgs', dest='agentArgs',
                       help='Comma separated values sent to agent. e.g. "opt1=val1,opt2,opt3=val3"')
     parser.add_option('-x', '--numTraining', dest='numTraining', type='int',
@@ -551,9 +573,11 @@ def readCommand(argv):
     parser.add_option('--frameTime', dest='frameTime', type='float',
                       help=default('Time to delay between frames; <0 means keyboard'), default=0.1)
     parser.add_option('-c', '--catchExceptions', action='store_true', dest='catchExceptions',
-                      help='Turns on exception handling and timeouts during games', default=False)
+                      help='Turns on exception handling and timeouts during games, and hands agents deep copies of the game state', default=False)
     parser.add_option('--timeout', dest='timeout', type='int',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('--parallel', dest='parallel', type='int',
+                      help=default('Number of worker processes that play the (non-training) games without graphics; 0 plays them one by one here'), default=0)
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
@@ -570,7 +594,7 @@ def readCommand(argv):
         raise Exception("The layout " + options.layout + " cannot be found")
 
     # Choose a Pacman agent
-    noKeyboard = options.gameToReplay == None and (
+    noKeyboard = options.gameToReplay == None and options.recordingsToVerify == None and (
         options.textGraphics or options.quietGraphics)
     pacmanType = loadAgent(options.pacman, noKeyboard)
     agentOpts = parseAgentArgs(options.agentArgs)
@@ -606,12 +630,20 @@ def readCommand(argv):
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    args['parallel'] = options.parallel
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
         print('Replaying recorded game %s.' % options.gameToReplay)
+        if recording.isRecording(options.gameToReplay):
+            record = recording.readRecord(options.gameToReplay)
+            if record.layoutHash != args['layout'].getHash():
+                raise Exception('The game was not recorded on the layout ' + options.layout)
+            replayGame(args['layout'], record.getMoves(), args['display'])
+            sys.exit(0)
+        # Recordings from older versions pickle the layout and actions
         import pickle
-        f = open(options.gameToReplay)
+        f = open(options.gameToReplay, 'rb')
         try:
             recorded = pickle.load(f)
         finally:
@@ -620,6 +652,11 @@ def readCommand(argv):
         replayGame(**recorded)
         sys.exit(0)
 
+    if options.recordingsToVerify != None:
+        import glob
+        verifyRecordings(sorted(glob.glob(options.recordingsToVerify)), [args['layout']])
+        sys.exit(0)
+
     return args
 
 
@@ -672,14 +709,145 @@ def replayGame(layout, actions, display):
     display.finish()
 
 
-def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, catchExceptions=False, timeout=30):
+def replayRecord(record, layout):
+    """
+    Replays a recorded game (see recording.py) without a display and
+    returns its final state, or None if the moves are illegal or go on past
+    the end of the game.
+    """
+    # Hashing every state for GameState.explored would dominate the replay
+    explored = GameState.explored
+    GameState.explored = None
+    try:
+        state = GameState()
+        state.initialize(layout, record.numAgents - 1)
+        for agentIndex, action in record.getMoves():
+            if state.isWin() or state.isLose():
+                return None
+            state = state.generateSuccessor(agentIndex, action)
+        return state
+    except Exception:
+        return None
+    finally:
+        GameState.explored = explored
+
+
+def verifyRecordings(fnames, layouts):
+    """
+    Indexes the recorded games in fnames, replays those played on one of
+    the given layouts and checks that each one ends with its recorded
+    number of moves, score and outcome.  Prints a line for every recording
+    that can't be verified and returns the list of verified records.
+    """
+    layoutsByHash = dict((layout.getHash(), layout) for layout in layouts)
+    verified = []
+    startTime = time.time()
+    for fname in fnames:
+        record = recording.readRecord(fname)
+        if record.outcome is None:
+            print('%s: unfinished recording' % fname)
+            continue
+        if record.layoutHash not in layoutsByHash:
+            print('%s: recorded on an unknown layout' % fname)
+            continue
+        state = replayRecord(record, layoutsByHash[record.layoutHash])
+        if state is None or len(record.actions) != record.numMoves or \
+                int(state.getScore()) != record.score or \
+                state.isWin() != record.isWin() or state.isLose() != record.isLose():
+            print('%s: replay does not match the recorded result' % fname)
+            continue
+        verified.append(record)
+    elapsed = time.time() - startTime
+    print('Verified %d of %d recorded games in %.2f seconds' %
+          (len(verified), len(fnames), elapsed))
+    return verified
+
+
+def runGame(job):
+    """
+    Plays one game without graphics in a worker process of runGames, after
+    seeding the random module with the game's own seed.  Returns the game
+    number and the finished game.
+    """
+    import textDisplay
+    i, seed, layout, pacman, ghosts, quiet, record, catchExceptions, timeout = job
+    random.seed(seed)
+    rules = ClassicGameRules(timeout)
+    game = rules.newGame(layout, pacman, ghosts,
+                         textDisplay.NullGraphics(), quiet, catchExceptions)
+    if record:
+        game.recorder = recordGame(layout, game, i, seed)
+    game.run()
+    if record:
+        game.recorder.finish(game.state)
+        game.recorder = None
+    # Games are sent back to the parent process, and StringIO can't be pickled
+    game.display = None
+    game.agentOutput = None
+    return i, game
+
+
+def gameSeed(masterSeed, i):
+    "The seed of game number i in a run with the given master seed"
+    return '%d-%d' % (masterSeed, i)
+
+
+def runParallelGames(layout, pacman, ghosts, gameNumbers, numTraining, record, catchExceptions, timeout, parallel, masterSeed):
+    """
+    Plays the given games over a pool of parallel worker processes and
+    returns them in order.  Each game is seeded with gameSeed, as in
+    runGames, so a seeded run gives the same games whatever the number of
+    workers.  Results are printed as the games finish.
+    """
+    import multiprocessing
+    jobs = [(i, gameSeed(masterSeed, i), layout, pacman, ghosts, i < numTraining, record, catchExceptions, timeout)
+            for i in gameNumbers]
+    games = {}
+    pool = multiprocessing.Pool(parallel)
+    try:
+        for i, game in pool.imap_unordered(runGame, jobs):
+            games[i] = game
+    finally:
+        pool.close()
+        pool.join()
+    return [games[i] for i in gameNumbers]
+
+
+def recordGame(layout, game, i, seed=None):
+    """
+    Returns a GameRecorder (recording.py) that writes the moves of game i
+    to a file named by the time it was played.
+    """
+    import time
+    fname = ('recorded-game-%d' % (i + 1)) + \
+        '-'.join([str(t) for t in time.localtime()[1:6]])
+    return recording.GameRecorder(fname, layout, len(game.agents), seed)
+
+
+def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, catchExceptions=False, timeout=30, parallel=0):
+    """
+    Plays numGames games and prints their statistics.  With parallel > 0
+    the games after the training games are played without graphics by that
+    many worker processes.  The training games are always played here, as
+    learning agents carry what they learn from one game to the next.
+
+    Each game reseeds the random module with gameSeed of a master seed
+    drawn from it and the game number, so game i plays out the same here
+    as in a worker, and a seeded run (-f or the autograder's seed) gives
+    the same games for any number of workers.
+    """
     import __main__
     __main__.__dict__['_display'] = display
 
     rules = ClassicGameRules(timeout)
     games = []
+    masterSeed = random.getrandbits(64)
+
+    numSequential = numGames
+    if parallel > 0:
+        numSequential = min(numTraining, numGames)
 
-    for i in range(numGames):
+    for i in range(numSequential):
         beQuiet = i < numTraining
         if beQuiet:
                 # Suppress output and graphics
@@ -689,21 +857,21 @@ def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, c
         else:
             gameDisplay = display
             rules.quiet = False
+        seed = gameSeed(masterSeed, i)
+        random.seed(seed)
         game = rules.newGame(layout, pacman, ghosts,
                              gameDisplay, beQuiet, catchExceptions)
+        if record:
+            game.recorder = recordGame(layout, game, i, seed)
         game.run()
+        if record:
+            game.recorder.finish(game.state)
         if not beQuiet:
             games.append(game)
 
-        if record:
-            import time
-            import pickle
-            fname = ('recorded-game-%d' % (i + 1)) + \
-                '-'.join([str(t) for t in time.localtime()[1:6]])
-            f = file(fname, 'w')
-            components = {'layout': layout, 'actions': game.moveHistory}
-            pickle.dump(components, f)
-            f.close()
+    if numSequential < numGames:
+        games.extend(runParallelGames(layout, pacman, ghosts, list(range(numSequential, numGames)),
+                                      numTraining, record, catchExceptions, timeout, parallel, masterSeed))
 
     if (numGames-numTraining) > 0:
         scores = [game.state.getScore() for game in games]
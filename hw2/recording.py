@@ -0,0 +1,171 @@
+# recording.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+A compact binary format for recorded games.
+
+Agents move in turn, starting from Pacman, so a game is fully described by
+its layout and its sequence of actions.  A recording holds:
+
+  header:  'PMRC', format version, SHA-1 of the layout text (see
+           Layout.getHash), number of agents, and the game's random seed
+           (empty if unknown)
+  actions: one 4-bit code per move, two moves per byte, ended by code 15
+  trailer: 'PMRE', number of moves, final score and outcome
+
+The GameRecorder writes moves to the file as they are made, and the trailer
+at the end of the game.  Since the trailer has a fixed size, readRecord can
+index a recording from its header and trailer alone.
+"""
+
+import struct
+from game import Directions
+
+RECORD_MAGIC = b'PMRC'
+TRAILER_MAGIC = b'PMRE'
+RECORD_VERSION = 1
+
+HEADER_FORMAT = '<4sB20sBH'
+TRAILER_FORMAT = '<4sIib'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+TRAILER_SIZE = struct.calcsize(TRAILER_FORMAT)
+
+ACTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST,
+           Directions.WEST, Directions.STOP]
+ACTION_CODES = dict((action, code) for code, action in enumerate(ACTIONS))
+END_CODE = 15
+
+# Outcomes stored in the trailer
+UNFINISHED, WIN, LOSE = 0, 1, 2
+
+
+def isRecording(fname):
+    "Returns whether the file is a recording in this format."
+    f = open(fname, 'rb')
+    try:
+        return f.read(len(RECORD_MAGIC)) == RECORD_MAGIC
+    finally:
+        f.close()
+
+
+class GameRecorder:
+    """
+    Streams the moves of a game to a recording file.  Game.run calls record
+    after every move; finish writes the trailer and closes the file.
+    """
+
+    def __init__(self, fname, layout, numAgents, seed=None):
+        self.file = open(fname, 'wb')
+        self.numMoves = 0
+        self.pending = None
+        seedBytes = b'' if seed is None else str(seed).encode('utf-8')
+        self.file.write(struct.pack(HEADER_FORMAT, RECORD_MAGIC, RECORD_VERSION,
+                                    bytes.fromhex(layout.getHash()), numAgents, len(seedBytes)))
+        self.file.write(seedBytes)
+
+    def record(self, agentIndex, action):
+        self._writeCode(ACTION_CODES[action])
+        self.numMoves += 1
+
+    def _writeCode(self, code):
+        if self.pending is None:
+            self.pending = code
+        else:
+            self.file.write(bytes(((self.pending << 4) | code,)))
+            self.pending = None
+
+    def finish(self, state):
+        "Writes the trailer for the final game state and closes the file."
+        self._writeCode(END_CODE)
+        if self.pending is not None:
+            self._writeCode(0)
+        outcome = UNFINISHED
+        if state.isWin():
+            outcome = WIN
+        elif state.isLose():
+            outcome = LOSE
+        self.file.write(struct.pack(TRAILER_FORMAT, TRAILER_MAGIC, self.numMoves,
+                                    int(state.getScore()), outcome))
+        self.file.close()
+
+
+class GameRecord:
+    """
+    A recorded game read by readRecord.  actions is None when only the
+    header and trailer were read, and numMoves, score and outcome are None
+    if the recording has no trailer (the game never finished).
+    """
+
+    def __init__(self, fname, layoutHash, numAgents, seed):
+        self.fname = fname
+        self.layoutHash = layoutHash
+        self.numAgents = numAgents
+        self.seed = seed
+        self.actions = None
+        self.numMoves = None
+        self.score = None
+        self.outcome = None
+
+    def getMoves(self):
+        "Returns the (agentIndex, action) history of the game."
+        return [(i % self.numAgents, action) for i, action in enumerate(self.actions)]
+
+    def isWin(self):
+        return self.outcome == WIN
+
+    def isLose(self):
+        return self.outcome == LOSE
+
+
+def readRecord(fname, readActions=True):
+    """
+    Reads a recording.  Unless readActions is True, only its header and
+    trailer are read, which is enough to index many recordings quickly.
+    """
+    f = open(fname, 'rb')
+    try:
+        magic, version, layoutHash, numAgents, seedLength = struct.unpack(
+            HEADER_FORMAT, f.read(HEADER_SIZE))
+        if magic != RECORD_MAGIC or version != RECORD_VERSION:
+            raise Exception('%s is not a version %d game recording' %
+                            (fname, RECORD_VERSION))
+        seed = f.read(seedLength).decode('utf-8') or None
+        record = GameRecord(fname, layoutHash.hex(), numAgents, seed)
+        dataStart = f.tell()
+
+        f.seek(0, 2)
+        if f.tell() - dataStart >= TRAILER_SIZE:
+            f.seek(-TRAILER_SIZE, 2)
+            magic, numMoves, score, outcome = struct.unpack(
+                TRAILER_FORMAT, f.read(TRAILER_SIZE))
+            if magic == TRAILER_MAGIC:
+                record.numMoves, record.score, record.outcome = numMoves, score, outcome
+
+        if readActions:
+            f.seek(dataStart)
+            record.actions = decodeActions(f.read())
+        return record
+    finally:
+        f.close()
+
+
+def decodeActions(data):
+    "Returns the actions packed at the start of data, up to the end code."
+    actions = []
+    for byte in data:
+        for code in (byte >> 4, byte & 15):
+            if code == END_CODE:
+                return actions
+            actions.append(ACTIONS[code])
+    return actions
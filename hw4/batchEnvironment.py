@@ -0,0 +1,326 @@
+# batchEnvironment.py
+# -------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Many games of classic Pacman against RandomGhosts, stepped together.
+
+Rather than a GameState per game, the batch keeps each field of every game
+in a flat list: Pacman's grid point, the ghosts' positions, directions and
+scared timers, the food and capsules as bitmasks, the scores.  The legal
+moves of every grid point are worked out once per batch, so a step is a
+few table lookups per agent.  The rules are those of PacmanRules and
+GhostRules, and the ghosts draw from random exactly as RandomGhost does,
+so a batch of one game plays out like a PacmanEnvironment with
+RandomGhosts.  getState materializes a regular GameState of any game, for
+feature extractors and the like.
+
+Ghost positions are kept in half steps, (2x, 2y), since scared ghosts
+move at half speed.
+"""
+
+from game import Directions, Actions, Configuration, Grid
+from pacman import GameState, SCARED_TIME, COLLISION_TOLERANCE, TIME_PENALTY
+import random
+import util
+
+
+class BatchPacmanEnvironment:
+    """
+    A batch of numGames games on one layout, each against (at most)
+    numGhosts RandomGhosts.
+
+      env = BatchPacmanEnvironment(layout, numGames)
+      rewards, dones = env.step(actions)
+
+    where actions holds Pacman's action in each game (ignored for games
+    that are done), rewards the changes in score and dones whether each
+    game has ended or reached its horizon.  Finished games wait for
+    reset(i).
+
+    Games are numbered in the order they start.  Given util.RandomStreams,
+    the ghosts of game number n draw from their streams for game n, as in
+    pacman.runGames with a seed, so each game plays out as it would there
+    whatever else is in the batch.
+    """
+
+    def __init__(self, layout, numGames, numGhosts=None, horizon=-1, streams=None):
+        self.layout = layout
+        self.numGames = numGames
+        if numGhosts is None:
+            numGhosts = layout.getNumGhosts()
+        self.numGhosts = min(numGhosts, layout.getNumGhosts())
+        self.horizon = horizon
+        width, height = layout.width, layout.height
+        walls = layout.walls
+        self.height = height
+
+        # Pacman stands on grid points, numbered x * height + y (the bits of
+        # the food and capsule masks).  For each point, the cell each legal
+        # action leads to, in the order of PacmanRules.getLegalActions.
+        self.pacmanMoves = {}
+        for x in range(width):
+            for y in range(height):
+                if not walls[x][y]:
+                    self.pacmanMoves[x * height + y] = dict(
+                        (action, (x + dx) * height + y + dy)
+                        for action, (dx, dy) in Actions._directionsAsList
+                        if not walls[x + dx][y + dy])
+
+        # For each grid point and the direction a ghost arrived in, its
+        # legal actions as RandomGhost samples them (sorted, with the same
+        # cumulative probabilities as util.sample)
+        self.ghostMoves = {}
+        for cell, moves in self.pacmanMoves.items():
+            x, y = divmod(cell, height)
+            byDirection = {}
+            for direction in Actions._directions:
+                legal = [action for action in moves if action != Directions.STOP]
+                reverse = Actions.reverseDirection(direction)
+                if reverse in legal and len(legal) > 1:
+                    legal.remove(reverse)
+                legal.sort()
+                byDirection[direction] = (
+                    [(action,) + Actions._directions[action] for action in legal],
+                    self.cumulativeUniform(len(legal)))
+            self.ghostMoves[(2 * x, 2 * y)] = byDirection
+
+        start = GameState()
+        start.initialize(layout, self.numGhosts)
+        pacmanX, pacmanY = start.getPacmanPosition()
+        self.pacmanStart = pacmanX * height + pacmanY
+        self.ghostStarts = [(2 * x, 2 * y) for x, y in start.getGhostPositions()]
+        self.startFood = 0
+        for x, y in layout.food.asList():
+            self.startFood |= 1 << (x * height + y)
+        self.startNumFood = len(layout.food.asList())
+        self.startCapsules = 0
+        for x, y in layout.capsules:
+            self.startCapsules |= 1 << (x * height + y)
+
+        n, g = numGames, self.numGhosts
+        self.pacman = [self.pacmanStart] * n
+        self.pacmanDirection = [Directions.STOP] * n
+        self.ghostPositions = self.ghostStarts * n
+        self.ghostDirections = [Directions.STOP] * (n * g)
+        self.scaredTimers = [0] * (n * g)
+        self.food = [self.startFood] * n
+        self.numFood = [self.startNumFood] * n
+        self.capsules = [self.startCapsules] * n
+        self.scores = [0] * n
+        self.wins = [False] * n
+        self.losses = [False] * n
+        self.streams = streams
+        self.ghostRandoms = [random] * (n * g)
+        self.gameNumbers = [None] * n
+        self.gamesStarted = 0
+        self.timesteps = [0] * n
+        self.dones = [horizon == 0] * n
+        self.reset()
+
+    def cumulativeUniform(self, k):
+        if k == 0:
+            return []
+        dist = [1.0 / k] * k
+        if sum(dist) != 1:
+            dist = util.normalize(dist)
+        cumulative, total = [], 0.0
+        for prob in dist:
+            total += prob
+            cumulative.append(total)
+        return cumulative
+
+    def reset(self, i=None):
+        """
+        Restarts game i, or every game if i is None.
+        """
+        if i is None:
+            for i in range(self.numGames):
+                self.reset(i)
+            return
+        g = self.numGhosts
+        self.pacman[i] = self.pacmanStart
+        self.pacmanDirection[i] = Directions.STOP
+        self.ghostPositions[i * g:(i + 1) * g] = self.ghostStarts
+        self.ghostDirections[i * g:(i + 1) * g] = [Directions.STOP] * g
+        self.scaredTimers[i * g:(i + 1) * g] = [0] * g
+        self.food[i] = self.startFood
+        self.numFood[i] = self.startNumFood
+        self.capsules[i] = self.startCapsules
+        self.scores[i] = 0
+        self.wins[i] = self.losses[i] = False
+        self.timesteps[i] = 0
+        self.dones[i] = self.horizon == 0
+        self.gameNumbers[i] = self.gamesStarted
+        self.gamesStarted += 1
+        if self.streams is not None:
+            for k in range(g):
+                self.ghostRandoms[i * g + k] = self.streams.getStream(
+                    self.gameNumbers[i], k + 1)
+
+    def getLegalActions(self, i):
+        "Pacman's legal actions in game i, or [] if it is done"
+        if self.dones[i]:
+            return []
+        return list(self.pacmanMoves[self.pacman[i]])
+
+    def getScore(self, i):
+        return self.scores[i]
+
+    def isWin(self, i):
+        return self.wins[i]
+
+    def isLose(self, i):
+        return self.losses[i]
+
+    def isDone(self, i):
+        return self.dones[i]
+
+    def step(self, actions):
+        """
+        Moves Pacman in each unfinished game, then its ghosts, and returns
+        the lists of rewards and done flags.
+        """
+        rewards = [0] * self.numGames
+        for i in range(self.numGames):
+            if not self.dones[i]:
+                rewards[i] = self.stepGame(i, actions[i])
+        return rewards, self.dones[:]
+
+    def stepGame(self, i, action):
+        """
+        Plays Pacman's action and the ghosts' replies in game i and returns
+        the change in score.
+        """
+        moves = self.pacmanMoves[self.pacman[i]]
+        if action not in moves:
+            raise Exception("Illegal action " + str(action))
+        cell = moves[action]
+        self.pacman[i] = cell
+        if action != Directions.STOP:
+            self.pacmanDirection[i] = action
+
+        # PacmanRules.consume
+        change = -TIME_PENALTY
+        bit = 1 << cell
+        if self.food[i] & bit:
+            self.food[i] ^= bit
+            self.numFood[i] -= 1
+            change += 10
+            if self.numFood[i] == 0:
+                change += 500
+                self.wins[i] = True
+        g = self.numGhosts
+        first = i * g
+        if self.capsules[i] & bit:
+            self.capsules[i] ^= bit
+            self.scaredTimers[first:first + g] = [SCARED_TIME] * g
+
+        # GhostRules.checkDeath: Pacman can run into any ghost
+        pacmanX, pacmanY = divmod(cell, self.height)
+        pacmanX, pacmanY = 2 * pacmanX, 2 * pacmanY
+        tolerance = 2 * COLLISION_TOLERANCE
+        positions = self.ghostPositions
+        for k in range(first, first + g):
+            x, y = positions[k]
+            if abs(x - pacmanX) + abs(y - pacmanY) <= tolerance:
+                change += self.collide(i, k)
+        if self.endTurn(i):
+            self.scores[i] += change
+            return change
+
+        directions, timers = self.ghostDirections, self.scaredTimers
+        randoms = self.ghostRandoms
+        for k in range(first, first + g):
+            # RandomGhost: one draw from random whatever the number of moves
+            x, y = positions[k]
+            direction = directions[k]
+            if x % 2 == 0 and y % 2 == 0:
+                legal, cumulative = self.ghostMoves[(x, y)][direction]
+                if not legal:
+                    raise Exception("Illegal ghost action Stop")
+                choice = randoms[k].random()
+                j = 0
+                while choice > cumulative[j]:
+                    j += 1
+                direction, dx, dy = legal[j]
+            else:
+                # Between grid points, ghosts keep going
+                randoms[k].random()
+                dx, dy = Actions._directions[direction]
+            if timers[k] > 0:
+                x, y = x + dx, y + dy
+            else:
+                x, y = x + 2 * dx, y + 2 * dy
+            # GhostRules.decrementTimer
+            if timers[k] == 1:
+                x, y = x + x % 2, y + y % 2
+            timers[k] = max(0, timers[k] - 1)
+            positions[k] = (x, y)
+            directions[k] = direction
+            if abs(x - pacmanX) + abs(y - pacmanY) <= tolerance:
+                change += self.collide(i, k)
+            if self.endTurn(i):
+                break
+        self.scores[i] += change
+        return change
+
+    def collide(self, i, k):
+        "GhostRules.collide of game i and ghost k (a flat index)"
+        if self.scaredTimers[k] > 0:
+            self.ghostPositions[k] = self.ghostStarts[k % self.numGhosts]
+            self.ghostDirections[k] = Directions.STOP
+            self.scaredTimers[k] = 0
+            return 200
+        if not self.wins[i]:
+            self.losses[i] = True
+            return -500
+        return 0
+
+    def endTurn(self, i):
+        "Counts an agent's move in game i and returns whether the game is done"
+        self.timesteps[i] += 1
+        if self.wins[i] or self.losses[i] or self.timesteps[i] == self.horizon:
+            self.dones[i] = True
+        return self.dones[i]
+
+    def getState(self, i):
+        """
+        Returns game i as a regular GameState.
+        """
+        height = self.height
+        state = GameState()
+        state.initialize(self.layout, self.numGhosts)
+        data = state.data
+        x, y = divmod(self.pacman[i], height)
+        data.agentStates[0].configuration = Configuration(
+            (x, y), self.pacmanDirection[i])
+        g = self.numGhosts
+        for index in range(1, g + 1):
+            k = i * g + index - 1
+            x, y = self.ghostPositions[k]
+            ghostState = data.agentStates[index]
+            ghostState.configuration = Configuration(
+                (x // 2 if x % 2 == 0 else x / 2.0, y // 2 if y % 2 == 0 else y / 2.0),
+                self.ghostDirections[k])
+            ghostState.scaredTimer = self.scaredTimers[k]
+        food = Grid(self.layout.width, height, False)
+        for x, y in self.layout.food.asList():
+            food[x][y] = bool(self.food[i] >> (x * height + y) & 1)
+        data.food = food
+        data.capsules = [(x, y) for x, y in self.layout.capsules
+                         if self.capsules[i] >> (x * height + y) & 1]
+        data.score = self.scores[i]
+        data._win = self.wins[i]
+        data._lose = self.losses[i]
+        return state
@@ -0,0 +1,122 @@
+# benchmarkActions.py
+# -------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Times the legal-move queries of game.Actions against the loops they
+replaced, in calls per second:
+
+  python benchmarkActions.py [-l mediumClassic] [-n 200000]
+
+The reference functions below are the original implementations.  The
+last line queries a few cells of each of a series of layout copies, as a
+feature extractor does with the observations of a game, where the tables
+have to be shared between copies of the walls to pay off.
+"""
+
+from game import Actions, Configuration, Directions
+import layout
+import optparse
+import time
+
+
+def referenceDirectionToVector(direction, speed=1.0):
+    dx, dy = Actions._directions[direction]
+    return (dx * speed, dy * speed)
+
+
+def referencePossibleActions(config, walls):
+    possible = []
+    x, y = config.pos
+    x_int, y_int = int(x + 0.5), int(y + 0.5)
+
+    # In between grid points, all agents must continue straight
+    if (abs(x - x_int) + abs(y - y_int) > Actions.TOLERANCE):
+        return [config.getDirection()]
+
+    for dir, vec in Actions._directionsAsList:
+        dx, dy = vec
+        next_y = y_int + dy
+        next_x = x_int + dx
+        if not walls[next_x][next_y]:
+            possible.append(dir)
+
+    return possible
+
+
+def referenceLegalNeighbors(position, walls):
+    x, y = position
+    x_int, y_int = int(x + 0.5), int(y + 0.5)
+    neighbors = []
+    for dir, vec in Actions._directionsAsList:
+        dx, dy = vec
+        next_x = x_int + dx
+        if next_x < 0 or next_x == walls.width:
+            continue
+        next_y = y_int + dy
+        if next_y < 0 or next_y == walls.height:
+            continue
+        if not walls[next_x][next_y]:
+            neighbors.append((next_x, next_y))
+    return neighbors
+
+
+def rate(function, args, calls):
+    "Calls function on each of args in turn, calls times, and returns calls per second"
+    start = time.perf_counter()
+    for i in range(calls // len(args)):
+        for arg in args:
+            function(*arg)
+    return (calls // len(args)) * len(args) / (time.perf_counter() - start)
+
+
+def copiesRate(lay, neighbors, copies, queries):
+    """
+    Layout copies per second, querying the legal neighbors of the first
+    queries open cells of each.
+    """
+    cells = lay.walls.asList(False)[:queries]
+    start = time.perf_counter()
+    for i in range(copies):
+        walls = lay.deepCopy().walls
+        for cell in cells:
+            neighbors(cell, walls)
+    return copies / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser()
+    parser.add_option('-l', '--layout', dest='layout', default='mediumClassic',
+                      help='Layout to query (default %default)')
+    parser.add_option('-n', '--calls', dest='calls', type='int', default=200000,
+                      help='Calls of each function (default %default)')
+    options, args = parser.parse_args()
+
+    lay = layout.getLayout(options.layout)
+    walls = lay.walls
+    cells = walls.asList(False)
+    configs = [(Configuration(cell, Directions.STOP), walls) for cell in cells]
+    positions = [(cell, walls) for cell in cells]
+    directions = [(direction,) for direction in Actions._directions]
+    Actions.getLegalMasks(walls)
+
+    print('%-22s %12s %12s' % ('calls/s', 'reference', 'Actions'))
+    for name, reference, function, args in [
+            ('getPossibleActions', referencePossibleActions, Actions.getPossibleActions, configs),
+            ('getLegalNeighbors', referenceLegalNeighbors, Actions.getLegalNeighbors, positions),
+            ('directionToVector', referenceDirectionToVector, Actions.directionToVector, directions)]:
+        print('%-22s %11.0fk %11.0fk' % (name, rate(reference, args, options.calls) / 1000,
+                                         rate(function, args, options.calls) / 1000))
+    copies = max(1, options.calls // 1000)
+    print('%-22s %12.0f %12.0f' % ('layout copies/s', copiesRate(lay, referenceLegalNeighbors, copies, 20),
+                                   copiesRate(lay, Actions.getLegalNeighbors, copies, 20)))
@@ -0,0 +1,101 @@
+# benchmarkTraces.py
+# ------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Counts the episodes Q-learning, Q(lambda) and SARSA(lambda) take to learn
+a good greedy policy on noiseless gridworlds:
+
+  python benchmarkTraces.py [-g BookGrid,MazeGrid] [-n 20] [--lambda 0.9]
+
+Each trial seeds the random module with its number, so runs repeat
+exactly.  After every episode the greedy policy is followed from the
+start; the trial ends once it collects the return given for the grid
+(the best exit, undiscounted), or after the episode limit.
+"""
+
+import gridworld
+import optparse
+import qlearningAgents
+import random
+
+
+# The undiscounted return of a good greedy policy on each grid
+THRESHOLDS = {'BookGrid': 1, 'MazeGrid': 1, 'BridgeGrid': 10, 'DiscountGrid': 10,
+              'CliffGrid': 10, 'CliffGrid2': 10}
+
+AGENTS = [('q', qlearningAgents.QLearningAgent),
+          ('qlambda', qlearningAgents.QLambdaAgent),
+          ('sarsalambda', qlearningAgents.SarsaLambdaAgent)]
+
+
+def greedyReturn(agent, mdp, steps=100):
+    "The undiscounted return of following the agent's policy from the start"
+    state, returns = mdp.getStartState(), 0
+    for i in range(steps):
+        if mdp.isTerminal(state):
+            break
+        action = agent.getPolicy(state)
+        if action is None:
+            break
+        [nextState] = [nextState for nextState, prob
+                       in mdp.getTransitionStatesAndProbs(state, action) if prob > 0]
+        returns += mdp.getReward(state, action, nextState)
+        state = nextState
+    return returns
+
+
+def episodesToThreshold(grid, agentType, seed, maxEpisodes, **agentArgs):
+    "The episodes agentType takes to reach the threshold of grid in trial seed"
+    random.seed(seed)
+    mdp = getattr(gridworld, 'get' + grid)()
+    mdp.setNoise(0.0)
+    environment = gridworld.GridworldEnvironment(mdp)
+    agent = agentType(actionFn=mdp.getPossibleActions, **agentArgs)
+    ignore = lambda *args: None
+    for episode in range(1, maxEpisodes + 1):
+        gridworld.runEpisode(agent, environment, agent.discount, agent.getAction,
+                             ignore, ignore, ignore, episode)
+        if greedyReturn(agent, mdp) >= THRESHOLDS[grid]:
+            return episode
+    return maxEpisodes
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser()
+    parser.add_option('-g', '--grids', dest='grids', default='BookGrid,MazeGrid,BridgeGrid,DiscountGrid',
+                      help='Comma-separated grids to learn (default %default)')
+    parser.add_option('-n', '--trials', dest='trials', type='int', default=20,
+                      help='Trials of each agent on each grid (default %default)')
+    parser.add_option('-e', '--episodes', dest='episodes', type='int', default=2000,
+                      help='Episode limit of a trial (default %default)')
+    parser.add_option('--lambda', dest='traceDecay', type='float', default=0.9,
+                      help='Trace decay of the qlambda and sarsalambda agents (default %default)')
+    parser.add_option('-a', '--alpha', dest='alpha', type='float', default=0.5,
+                      help='Learning rate (default %default)')
+    parser.add_option('-p', '--epsilon', dest='epsilon', type='float', default=0.3,
+                      help='Exploration rate (default %default)')
+    parser.add_option('-d', '--discount', dest='discount', type='float', default=0.9,
+                      help='Discount (default %default)')
+    options, args = parser.parse_args()
+
+    print('%-14s %-12s %8s %8s' % ('episodes', 'agent', 'mean', 'median'))
+    for grid in options.grids.split(','):
+        for name, agentType in AGENTS:
+            agentArgs = dict(alpha=options.alpha, epsilon=options.epsilon, gamma=options.discount)
+            if agentType is not qlearningAgents.QLearningAgent:
+                agentArgs['traceDecay'] = options.traceDecay
+            episodes = sorted(episodesToThreshold(grid, agentType, seed, options.episodes, **agentArgs)
+                              for seed in range(options.trials))
+            print('%-14s %-12s %8.1f %8d' % (grid, name, sum(episodes) / len(episodes),
+                                             episodes[len(episodes) // 2]))
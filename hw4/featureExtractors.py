@@ -15,6 +15,8 @@
 "Feature extractors for Pacman game states"
 
 from game import Directions, Actions
+import collections
+import heapq
 import util
 
 class FeatureExtractor:
@@ -26,6 +28,31 @@ class FeatureExtractor:
         """
         util.raiseNotDefined()
 
+class FeatureIndex:
+    """
+    Numbers features in the order they are first seen, so that a feature
+    dict can be kept sparsely as a tuple of feature numbers and a tuple of
+    their values (see toSparse).
+    """
+    def __init__(self):
+        self.indices = {}
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def getIndex(self, feature):
+        index = self.indices.get(feature)
+        if index is None:
+            index = self.indices[feature] = len(self.names)
+            self.names.append(feature)
+        return index
+
+    def toSparse(self, features):
+        "The dict of features as (feature numbers, values), in the dict's order"
+        getIndex = self.getIndex
+        return tuple([getIndex(feature) for feature in features]), tuple(features.values())
+
 class IdentityExtractor(FeatureExtractor):
     def getFeatures(self, state, action):
         feats = util.Counter()
@@ -41,15 +68,190 @@ class CoordinateExtractor(FeatureExtractor):
         feats['action=%s' % action] = 1.0
         return feats
 
+class FoodDistanceField:
+    """
+    The maze distance from every open cell of a layout to the nearest food,
+    kept for whichever food grids were asked about last.
+
+    The field of a food grid is found by a BFS from all the food at once.
+    Within a game the food only ever shrinks a cell at a time, so a new
+    grid is rather repaired from the field of the last one: eating a food
+    re-settles just the cells whose nearest food it was, and food that
+    reappears (a state from before the bite, a new game) spreads out from
+    where it is.  The fields of the last two grids are remembered, which
+    suits an agent looking from state to nextState and back.  A grid is
+    recognized by identity, or by sharing its data with a remembered grid
+    as the successors a GameState generates do; any other grid is diffed
+    against the last one once, when it is first looked up.  Food grids
+    must not change once they have been looked up; GameStates copy the
+    grid before eating from it.
+
+    One field serves all the food grids of a layout.  It is kept on the
+    layout itself and handed on to its copies, so it lasts as long as the
+    layout's game does:
+
+      FoodDistanceField.forLayout(layout).getDistance(pos, food)
+    """
+
+    # Past this many changed cells it is cheaper to start over
+    MAX_REPAIRS = 8
+
+    def __init__(self, walls):
+        self.walls = walls
+        self.height = walls.height
+        self.size = walls.width * walls.height
+        self.neighbors = [()] * self.size
+        for x in range(walls.width):
+            for y in range(walls.height):
+                if not walls[x][y]:
+                    self.neighbors[x * self.height + y] = tuple(
+                        nx * self.height + ny
+                        for nx, ny in Actions.getLegalNeighbors((x, y), walls))
+        self.recent = [(None, None), (None, None)]
+
+    def forLayout(layout):
+        "The field of layout, made the first time it is asked for"
+        if layout.foodDistanceField is None:
+            layout.foodDistanceField = FoodDistanceField(layout.walls)
+        return layout.foodDistanceField
+    forLayout = staticmethod(forLayout)
+
+    def getDistance(self, pos, food):
+        "The maze distance from pos to the nearest food, or None if there is none"
+        x, y = pos
+        distances = self.getDistances(food)
+        if self.walls[x][y]:
+            # A BFS from a wall has to step out of it first
+            dists = [distances[nx * self.height + ny]
+                     for nx, ny in Actions.getLegalNeighbors((x, y), self.walls)]
+            dists = [dist for dist in dists if dist is not None]
+            return min(dists) + 1 if dists else None
+        return distances[x * self.height + y]
+
+    def getDistances(self, food):
+        "The field of food: a list of distances (or None) by x * height + y"
+        recent = self.recent
+        if self.isSame(recent[0][0], food):
+            return recent[0][1]
+        if self.isSame(recent[1][0], food):
+            recent[0], recent[1] = recent[1], recent[0]
+            return recent[0][1]
+        lastFood, lastDistances = recent[0]
+        distances = None
+        if lastFood is not None:
+            distances = self.repair(lastFood, lastDistances, food)
+        if distances is None:
+            distances = self.compute(food)
+        recent[1] = recent[0]
+        recent[0] = (food, distances)
+        return distances
+
+    def isSame(self, oldFood, food):
+        "Whether food is oldFood or a shallow copy sharing its data"
+        return oldFood is food or (oldFood is not None and oldFood.data is food.data)
+
+    def compute(self, food):
+        "The field of food from scratch, by a BFS out of every food at once"
+        distances = [None] * self.size
+        fringe = [x * self.height + y for x, y in food.asList()]
+        for cell in fringe:
+            distances[cell] = 0
+        self.spread(distances, fringe)
+        return distances
+
+    def spread(self, distances, fringe):
+        """
+        Runs a BFS from the cells of fringe, lowering distances wherever
+        it gets somewhere sooner.  The fringe must be in order of distance.
+        """
+        neighbors = self.neighbors
+        for cell in fringe:
+            dist = distances[cell] + 1
+            for nbr in neighbors[cell]:
+                old = distances[nbr]
+                if old is None or old > dist:
+                    distances[nbr] = dist
+                    fringe.append(nbr)
+
+    def repair(self, oldFood, oldDistances, food):
+        """
+        The field of food made from that of oldFood, or None if the grids
+        differ in too many cells to be worth it.  Grids with the same food
+        share the field.
+        """
+        height = self.height
+        eaten, added = [], []
+        for x, (oldColumn, column) in enumerate(zip(oldFood.data, food.data)):
+            if oldColumn != column:
+                for y, (old, new) in enumerate(zip(oldColumn, column)):
+                    if old and not new:
+                        eaten.append(x * height + y)
+                    elif new and not old:
+                        added.append(x * height + y)
+        if len(eaten) + len(added) > self.MAX_REPAIRS:
+            return None
+        if not eaten and not added:
+            return oldDistances
+        distances = oldDistances[:]
+        for cell in eaten:
+            self.removeSource(distances, cell)
+        for cell in added:
+            distances[cell] = 0
+        self.spread(distances, added)
+        return distances
+
+    def removeSource(self, distances, source):
+        """
+        Repairs distances for the food at source having been eaten.  The
+        cells that may have lost their nearest food are visited outward
+        from source, a level at a time; a cell keeps its distance if a
+        neighbor one step nearer food still holds its own.  The cells left
+        unsettled then take their distance from the settled cells around
+        them, nearest first.
+        """
+        neighbors = self.neighbors
+        unsettled = set([source])
+        fringe = [source]
+        for cell in fringe:
+            dist = distances[cell]
+            for nbr in neighbors[cell]:
+                if distances[nbr] == dist + 1 and nbr not in unsettled:
+                    if not any(distances[other] == dist and other not in unsettled
+                               for other in neighbors[nbr]):
+                        unsettled.add(nbr)
+                        fringe.append(nbr)
+
+        heap = []
+        for cell in unsettled:
+            distances[cell] = None
+        for cell in unsettled:
+            for nbr in neighbors[cell]:
+                if nbr not in unsettled and distances[nbr] is not None:
+                    if distances[cell] is None or distances[nbr] + 1 < distances[cell]:
+                        distances[cell] = distances[nbr] + 1
+            if distances[cell] is not None:
+                heap.append((distances[cell], cell))
+        heapq.heapify(heap)
+        while heap:
+            dist, cell = heapq.heappop(heap)
+            if dist != distances[cell]:
+                continue
+            for nbr in neighbors[cell]:
+                if nbr in unsettled and (distances[nbr] is None or distances[nbr] > dist + 1):
+                    distances[nbr] = dist + 1
+                    heapq.heappush(heap, (dist + 1, nbr))
+
 def closestFood(pos, food, walls):
     """
     closestFood -- this is similar to the function that we have
-    worked on in the search project; here its all in one place
+    worked on in the search project; here its all in one place.
+    A FoodDistanceField answers the same question faster when the
+    layout is at hand.
     """
-    fringe = [(pos[0], pos[1], 0)]
+    fringe = collections.deque([(pos[0], pos[1], 0)])
     expanded = set()
     while fringe:
-        pos_x, pos_y, dist = fringe.pop(0)
+        pos_x, pos_y, dist = fringe.popleft()
         if (pos_x, pos_y) in expanded:
             continue
         expanded.add((pos_x, pos_y))
@@ -94,7 +296,7 @@ class SimpleExtractor(FeatureExtractor):
         if not features["#-of-ghosts-1-step-away"] and food[next_x][next_y]:
             features["eats-food"] = 1.0
 
-        dist = closestFood((next_x, next_y), food, walls)
+        dist = FoodDistanceField.forLayout(state.data.layout).getDistance((next_x, next_y), food)
         if dist is not None:
             # make the distance a number less than one otherwise the update
             # will diverge wildly
@@ -22,6 +22,11 @@ import optparse
 class Gridworld(mdp.MarkovDecisionProcess):
     """
       Gridworld
+
+      The states, start state, rewards and transitions are worked out
+      once, when the gridworld is made (and again when the noise or
+      living reward change), so the mdp methods are table lookups.
+      Change the grid itself only through a new Gridworld.
     """
     def __init__(self, grid):
         # layout
@@ -33,6 +38,10 @@ class Gridworld(mdp.MarkovDecisionProcess):
         self.noise = 0.2
         # self.noise = 0
 
+        self.__buildStates()
+        self.__buildRewards()
+        self.__buildTransitions()
+
     def setLivingReward(self, reward):
         """
         The (negative) reward for exiting "normal" states.
@@ -42,12 +51,41 @@ class Gridworld(mdp.MarkovDecisionProcess):
         future rewards.
         """
         self.livingReward = reward
+        self.__buildRewards()
 
     def setNoise(self, noise):
         """
         The probability of moving in an unintended direction.
         """
         self.noise = noise
+        self.__buildTransitions()
+
+    def __buildStates(self):
+        self.states = [self.grid.terminalState]
+        self.startState = None
+        self.actions = {self.grid.terminalState: ()}
+        for x in range(self.grid.width):
+            for y in range(self.grid.height):
+                cell = self.grid[x][y]
+                if cell != '#':
+                    self.states.append((x, y))
+                    if type(cell) == int:
+                        self.actions[(x, y)] = ('exit',)
+                    else:
+                        self.actions[(x, y)] = ('north','west','south','east')
+                if cell == 'S' and self.startState is None:
+                    self.startState = (x, y)
+
+    def __buildRewards(self):
+        self.rewards = {}
+        for state in self.states:
+            self.rewards[state] = self.__computeReward(state)
+
+    def __buildTransitions(self):
+        self.transitions = {}
+        for state in self.states:
+            for action in self.actions[state]:
+                self.transitions[(state, action)] = self.__computeTransitionStatesAndProbs(state, action)
 
 
     def getPossibleActions(self, state):
@@ -58,6 +96,9 @@ class Gridworld(mdp.MarkovDecisionProcess):
         that "exit" states transition to the terminal
         state under the special action "done".
         """
+        actions = self.actions.get(state)
+        if actions is not None:
+            return actions
         if state == self.grid.terminalState:
             return ()
         x,y = state
@@ -75,14 +116,7 @@ class Gridworld(mdp.MarkovDecisionProcess):
         """
         Return list of all states.
         """
-        # The true terminal state.
-        states = [self.grid.terminalState]
-        for x in range(self.grid.width):
-            for y in range(self.grid.height):
-                if self.grid[x][y] != '#':
-                    state = (x,y)
-                    states.append(state)
-        return states
+        return list(self.states)
 
     def getReward(self, state, action, nextState):
         """
@@ -92,6 +126,12 @@ class Gridworld(mdp.MarkovDecisionProcess):
         departed (as in the R+N book examples, which more or
         less use this convention).
         """
+        reward = self.rewards.get(state)
+        if reward is not None:
+            return reward
+        return self.__computeReward(state)
+
+    def __computeReward(self, state):
         if state == self.grid.terminalState:
             return 0.0
         x, y = state
@@ -101,11 +141,9 @@ class Gridworld(mdp.MarkovDecisionProcess):
         return self.livingReward
 
     def getStartState(self):
-        for x in range(self.grid.width):
-            for y in range(self.grid.height):
-                if self.grid[x][y] == 'S':
-                    return (x, y)
-        raise Exception('Grid has no start state')
+        if self.startState is None:
+            raise Exception('Grid has no start state')
+        return self.startState
 
     def isTerminal(self, state):
         """
@@ -125,10 +163,16 @@ class Gridworld(mdp.MarkovDecisionProcess):
         from 'state' by taking 'action' along
         with their transition probabilities.
         """
+        successors = self.transitions.get((state, action))
+        if successors is not None:
+            return list(successors)
 
         if action not in self.getPossibleActions(state):
             raise Exception("Illegal action!")
 
+        return self.__computeTransitionStatesAndProbs(state, action)
+
+    def __computeTransitionStatesAndProbs(self, state, action):
         if self.isTerminal(state):
             return []
 
@@ -402,9 +446,15 @@ def parseOptions():
     optParser.add_option('-l', '--learningRate',action='store',
                          type='float',dest='learningRate',default=0.5,
                          metavar="P", help='TD learning rate (default %default)' )
+    optParser.add_option('--lambda',action='store',
+                         type='float',dest='traceDecay',default=0.9,
+                         metavar="L", help='Trace decay of the qlambda and sarsalambda agents (default %default)' )
     optParser.add_option('-i', '--iterations',action='store',
                          type='int',dest='iters',default=10,
                          metavar="K", help='Number of rounds of value iteration (default %default)')
+    optParser.add_option('-c', '--convergence',action='store',
+                         type='float',dest='convergence',default=0.0,
+                         metavar="C", help='Stop value iteration once the values are within C of converging, rather than running every round')
     optParser.add_option('-k', '--episodes',action='store',
                          type='int',dest='episodes',default=1,
                          metavar="K", help='Number of epsiodes of the MDP to run (default %default)')
@@ -415,7 +465,7 @@ def parseOptions():
                          help='Request a window width of X pixels *per grid cell* (default %default)')
     optParser.add_option('-a', '--agent',action='store', metavar="A",
                          type='string',dest='agent',default="random",
-                         help='Agent type (options are \'random\', \'value\', \'q\', and \'learn\', default %default)')
+                         help='Agent type (options are \'random\', \'value\', \'matrixvalue\', \'asynchvalue\', \'priosweepvalue\', \'policy\', \'modpolicy\', \'q\', \'qlambda\', \'sarsalambda\', and \'learn\', default %default)')
     optParser.add_option('-t', '--text',action='store_true',
                          dest='textDisplay',default=False,
                          help='Use text-only ASCII display')
@@ -436,7 +486,7 @@ def parseOptions():
 
     opts, args = optParser.parse_args()
 
-    if opts.manual and (opts.agent != 'q' and opts.agent != 'learn'):
+    if opts.manual and opts.agent not in ('q', 'qlambda', 'sarsalambda', 'learn'):
         print('## Disabling Agents in Manual Mode (-m) ##')
         opts.agent = None
 
@@ -488,8 +538,15 @@ if __name__ == '__main__':
 
     import valueIterationAgents, qlearningAgents
     a = None
+    convergence = opts.convergence or None
     if opts.agent == 'value':
-        a = valueIterationAgents.ValueIterationAgent(mdp, opts.discount, opts.iters)
+        a = valueIterationAgents.ValueIterationAgent(mdp, opts.discount, opts.iters, convergence)
+    elif opts.agent == 'matrixvalue':
+        a = valueIterationAgents.MatrixValueIterationAgent(mdp, opts.discount, opts.iters, convergence)
+    elif opts.agent == 'policy':
+        a = valueIterationAgents.PolicyIterationAgent(mdp, opts.discount, opts.iters)
+    elif opts.agent == 'modpolicy':
+        a = valueIterationAgents.ModifiedPolicyIterationAgent(mdp, opts.discount, opts.iters, convergence)
     elif opts.agent == 'learn':
         print("HERE")
         gridWorldEnv = GridworldEnvironment(mdp)
@@ -509,6 +566,17 @@ if __name__ == '__main__':
                       'epsilon': opts.epsilon,
                       'actionFn': actionFn}
         a = qlearningAgents.QLearningAgent(**qLearnOpts)
+    elif opts.agent in ('qlambda', 'sarsalambda'):
+        actionFn = lambda state: mdp.getPossibleActions(state)
+        qLearnOpts = {'gamma': opts.discount,
+                      'alpha': opts.learningRate,
+                      'epsilon': opts.epsilon,
+                      'actionFn': actionFn,
+                      'traceDecay': opts.traceDecay}
+        if opts.agent == 'qlambda':
+            a = qlearningAgents.QLambdaAgent(**qLearnOpts)
+        else:
+            a = qlearningAgents.SarsaLambdaAgent(**qLearnOpts)
     elif opts.agent == 'random':
         # # No reason to use the random agent without episodes
         if opts.episodes == 0:
@@ -534,21 +602,27 @@ if __name__ == '__main__':
         if not opts.manual: raise Exception('Unknown agent type: '+opts.agent)
 
 
+    # The solver may have converged before running every round
+    iterations = opts.iters
+    if hasattr(a, 'hasConverged') and (a.hasConverged() or 0 < len(a.residuals) < opts.iters):
+        iterations = len(a.residuals)
+        print("Converged after %d iterations (last residual %g)" % (iterations, a.residuals[-1]))
+
     ###########################
     # RUN EPISODES
     ###########################
     # DISPLAY Q/V VALUES BEFORE SIMULATION OF EPISODES
     try:
-        if not opts.manual and opts.agent in ('value', 'asynchvalue', 'priosweepvalue', 'learn'):
+        if not opts.manual and opts.agent in ('value', 'matrixvalue', 'asynchvalue', 'priosweepvalue', 'policy', 'modpolicy', 'learn'):
             if opts.valueSteps:
-                for i in range(opts.iters):
+                for i in range(iterations):
                     tempAgent = valueIterationAgents.ValueIterationAgent(mdp, opts.discount, i)
                     display.displayValues(tempAgent, message = "VALUES AFTER "+str(i)+" ITERATIONS")
                     display.pause()
 
-            display.displayValues(a, message = "VALUES AFTER "+str(opts.iters)+" ITERATIONS")
+            display.displayValues(a, message = "VALUES AFTER "+str(iterations)+" ITERATIONS")
             display.pause()
-            display.displayQValues(a, message = "Q-VALUES AFTER "+str(opts.iters)+" ITERATIONS")
+            display.displayQValues(a, message = "Q-VALUES AFTER "+str(iterations)+" ITERATIONS")
             display.pause()
     except KeyboardInterrupt:
         sys.exit(0)
@@ -561,9 +635,9 @@ if __name__ == '__main__':
         if opts.manual and opts.agent == None:
             displayCallback = lambda state: display.displayNullValues(state)
         else:
-            if opts.agent in ('random', 'value', 'asynchvalue', 'priosweepvalue'):
+            if opts.agent in ('random', 'value', 'matrixvalue', 'asynchvalue', 'priosweepvalue', 'policy', 'modpolicy'):
                 displayCallback = lambda state: display.displayValues(a, state, "CURRENT VALUES")
-            if opts.agent == 'q': displayCallback = lambda state: display.displayQValues(a, state, "CURRENT Q-VALUES")
+            if opts.agent in ('q', 'qlambda', 'sarsalambda'): displayCallback = lambda state: display.displayQValues(a, state, "CURRENT Q-VALUES")
 
     messageCallback = lambda x: printString(x)
     if opts.quiet:
@@ -595,7 +669,7 @@ if __name__ == '__main__':
         print()
 
     # DISPLAY POST-LEARNING VALUES / Q-VALUES
-    if opts.agent == 'q' and not opts.manual:
+    if opts.agent in ('q', 'qlambda', 'sarsalambda') and not opts.manual:
         try:
             display.displayQValues(a, message = "Q-VALUES AFTER "+str(opts.episodes)+" EPISODES")
             display.pause()
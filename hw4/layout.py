@@ -37,6 +37,8 @@ class Layout:
         self.processLayoutText(layoutText)
         self.layoutText = layoutText
         self.totalFood = len(self.food.asList())
+        # Built by featureExtractors on first use, and shared with copies
+        self.foodDistanceField = None
         # self.initializeVisibilityMatrix()
 
     def getNumGhosts(self):
@@ -70,18 +72,22 @@ class Layout:
         x, col = pos
         return self.walls[x][col]
 
-    def getRandomLegalPosition(self):
-        x = random.choice(list(range(self.width)))
-        y = random.choice(list(range(self.height)))
+    def getRandomLegalPosition(self, randObj=None):
+        if randObj is None:
+            randObj = random
+        x = randObj.choice(list(range(self.width)))
+        y = randObj.choice(list(range(self.height)))
         while self.isWall((x, y)):
-            x = random.choice(list(range(self.width)))
-            y = random.choice(list(range(self.height)))
+            x = randObj.choice(list(range(self.width)))
+            y = randObj.choice(list(range(self.height)))
         return (x, y)
 
-    def getRandomCorner(self):
+    def getRandomCorner(self, randObj=None):
+        if randObj is None:
+            randObj = random
         poses = [(1, 1), (1, self.height - 2), (self.width - 2, 1),
                  (self.width - 2, self.height - 2)]
-        return random.choice(poses)
+        return randObj.choice(poses)
 
     def getFurthestCorner(self, pacPos):
         poses = [(1, 1), (1, self.height - 2), (self.width - 2, 1),
@@ -97,7 +103,9 @@ class Layout:
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        layout = Layout(self.layoutText[:])
+        layout.foodDistanceField = self.foodDistanceField
+        return layout
 
     def processLayoutText(self, layoutText):
         """
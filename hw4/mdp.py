@@ -12,7 +12,10 @@
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 
+import heapq
+import operator
 import random
+import util
 
 class MarkovDecisionProcess:
 
@@ -65,3 +68,176 @@ class MarkovDecisionProcess:
         are equivalent.
         """
         abstract
+
+
+class CompiledMDP:
+    """
+    The transitions and rewards of a MarkovDecisionProcess with finitely
+    many states, read off once and numbered, for solvers that sweep the
+    whole state space many times.
+
+    States are numbered in the order of getStates.  The (state, action)
+    pairs are numbered in the order of the states and their possible
+    actions, those of state s running from pairStart[s] to pairStart[s+1].
+    Each pair p is a sparse row of the transition matrix of its action:
+
+      successors[p]      - the numbers of the states it can lead to
+      probabilities[p]   - the probability of each
+      expectedRewards[p] - the reward to expect from taking it
+
+    and rows[p] holds the three together.  Terminal states have no pairs,
+    and their value is always 0.  States without possible actions are
+    counted as terminal too.
+    """
+
+    # Pivots smaller than this leave the policy's equations unsolvable
+    SINGULAR_PIVOT = 1e-12
+
+    def __init__(self, mdp):
+        self.mdp = mdp
+        self.states = list(mdp.getStates())
+        self.stateIndex = dict((state, s) for s, state in enumerate(self.states))
+        self.terminal = [mdp.isTerminal(state) for state in self.states]
+        self.pairStart = [0]
+        self.pairIndex = {}
+        self.actions, self.successors, self.probabilities, self.expectedRewards = [], [], [], []
+        for s, state in enumerate(self.states):
+            if not self.terminal[s]:
+                for action in mdp.getPossibleActions(state):
+                    self.pairIndex[(s, action)] = len(self.actions)
+                    successors, probabilities, expectedReward = [], [], 0.0
+                    for nextState, prob in mdp.getTransitionStatesAndProbs(state, action):
+                        successors.append(self.stateIndex[nextState])
+                        probabilities.append(prob)
+                        expectedReward += prob * mdp.getReward(state, action, nextState)
+                    self.actions.append(action)
+                    self.successors.append(tuple(successors))
+                    self.probabilities.append(tuple(probabilities))
+                    self.expectedRewards.append(expectedReward)
+            if len(self.actions) == self.pairStart[-1]:
+                self.terminal[s] = True
+            self.pairStart.append(len(self.actions))
+        self.rows = list(zip(self.expectedRewards, self.probabilities, self.successors))
+
+    def getNumStates(self):
+        return len(self.states)
+
+    def getPairs(self, s):
+        "The numbers of the (state, action) pairs of state number s"
+        return range(self.pairStart[s], self.pairStart[s + 1])
+
+    def getPredecessors(self):
+        """
+        For each state number, the set of state numbers with some action
+        that can lead to it.
+        """
+        predecessors = [set() for state in self.states]
+        for s in range(len(self.states)):
+            for p in self.getPairs(s):
+                for nextState, prob in zip(self.successors[p], self.probabilities[p]):
+                    if prob > 0:
+                        predecessors[nextState].add(s)
+        return predecessors
+
+    def getQValue(self, p, values, discount):
+        "The Q-value of pair p given the list of state values"
+        return self.expectedRewards[p] + discount * sum(
+            map(operator.mul, self.probabilities[p], map(values.__getitem__, self.successors[p])))
+
+    def getQValues(self, s, values, discount):
+        return [self.getQValue(p, values, discount) for p in self.getPairs(s)]
+
+    def backup(self, values, discount):
+        """
+        Returns the values after one synchronous Bellman backup of values.
+        """
+        pairStart, mul, getValue = self.pairStart, operator.mul, values.__getitem__
+        rows = self.rows
+        newValues = [0.0] * len(values)
+        for s in range(len(values)):
+            start, end = pairStart[s], pairStart[s + 1]
+            if start < end:
+                newValues[s] = max([reward + discount * sum(map(mul, probabilities, map(getValue, successors)))
+                                    for reward, probabilities, successors in rows[start:end]])
+        return newValues
+
+    def improvePolicy(self, policy, values, discount):
+        """
+        Returns the greedy policy for values and the values it backs up
+        to.  A policy is a list of the pair each state number takes, None
+        for states without pairs; the pair policy gives a state is kept
+        unless another does strictly better.
+        """
+        newPolicy, newValues = [None] * len(values), [0.0] * len(values)
+        for s in range(len(values)):
+            start, end = self.pairStart[s], self.pairStart[s + 1]
+            if start < end:
+                best = start if policy[s] is None else policy[s]
+                bestValue = self.getQValue(best, values, discount)
+                for p in range(start, end):
+                    qValue = self.getQValue(p, values, discount)
+                    if qValue > bestValue:
+                        best, bestValue = p, qValue
+                newPolicy[s], newValues[s] = best, bestValue
+        return newPolicy, newValues
+
+    def evaluatePolicy(self, policy, discount, values=None, k=None):
+        """
+        Returns the values of following policy.  Given k, they are found
+        by k backups of values under the policy.  Otherwise they are
+        exact, solving
+
+          V[s] - discount * sum(probabilities[p][i] * V[successors[p][i]]) = expectedRewards[p]
+
+        for the pair p of each state by sparse Gaussian elimination, in
+        state order and without pivoting.  The equations are solvable
+        when discount < 1, or when the policy is sure to end.  When they
+        are not (a pivot comes out as zero, as for a policy that walks
+        into a wall forever without discounting), the values are found by
+        one backup per state instead, from values.
+        """
+        n = len(self.states)
+        if k is not None:
+            values = list(values or [0.0] * n)
+            for i in range(k):
+                values = [0.0 if p is None else self.getQValue(p, values, discount) for p in policy]
+            return values
+
+        # Forward elimination leaves row s of the upper triangle as a dict
+        # of the later states it depends on, with the pivot divided out
+        rows, rhs = [None] * n, [0.0] * n
+        for s in range(n):
+            row, p = {s: 1.0}, policy[s]
+            if p is not None:
+                for nextState, prob in zip(self.successors[p], self.probabilities[p]):
+                    row[nextState] = row.get(nextState, 0.0) - discount * prob
+                rhs[s] = self.expectedRewards[p]
+            earlier = [j for j in row if j < s]
+            heapq.heapify(earlier)
+            while earlier:
+                j = heapq.heappop(earlier)
+                factor = row.pop(j)
+                for c, coefficient in rows[j].items():
+                    if c not in row:
+                        row[c] = 0.0
+                        if c < s:
+                            heapq.heappush(earlier, c)
+                    row[c] -= factor * coefficient
+                rhs[s] -= factor * rhs[j]
+            pivot = row.pop(s)
+            if abs(pivot) < self.SINGULAR_PIVOT:
+                return self.evaluatePolicy(policy, discount, values, n)
+            rows[s] = dict((c, coefficient / pivot) for c, coefficient in row.items() if coefficient != 0.0)
+            rhs[s] /= pivot
+
+        values = [0.0] * n
+        for s in range(n - 1, -1, -1):
+            values[s] = rhs[s] - sum([coefficient * values[c] for c, coefficient in rows[s].items()])
+        return values
+
+    def toCounter(self, values):
+        "The list of state values as a util.Counter keyed by state"
+        counter = util.Counter()
+        for state, value in zip(self.states, values):
+            counter[state] = value
+        return counter
@@ -47,6 +47,7 @@ from util import nearestPoint
 from util import manhattanDistance
 import util
 import layout
+import environment
 import sys
 import types
 import time
@@ -129,8 +130,9 @@ class GameState:
         # Book keeping
         state.data._agentMoved = agentIndex
         state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
+        if GameState.explored is not None:
+            GameState.explored.add(self)
+            GameState.explored.add(state)
         return state
 
     def getLegalPacmanActions(self):
@@ -478,6 +480,76 @@ class GhostRules:
         ghostState.configuration = ghostState.start
     placeGhost = staticmethod(placeGhost)
 
+class PacmanEnvironment(environment.Environment):
+    """
+    A stripped-down simulation of the classic game for training runs: the
+    same rules and ghost agents as a Game, but no display, timing, muting,
+    copied observations or move history.
+
+      state = env.reset()
+      state, reward, done = env.step(action)
+
+    The ghosts move within step, so every state it returns is Pacman's
+    turn (or the end of the game).  Driven by runEpisode, the agents and
+    the random number generator are called in the same order as by
+    Game.run, so a seeded run plays out exactly the same games.
+    """
+
+    def __init__(self, layout, ghosts, horizon=-1):
+        self.layout = layout
+        self.ghosts = ghosts[:layout.getNumGhosts()]
+        self.horizon = horizon
+        self.reset()
+
+    def getCurrentState(self):
+        return self.state
+
+    def getPossibleActions(self, state):
+        return state.getLegalActions(0)
+
+    def doAction(self, action):
+        nextState, reward, done = self.step(action)
+        return (nextState, reward)
+
+    def isTerminal(self):
+        return self.done
+
+    def reset(self):
+        """
+        Starts a new game and returns its initial state.
+        """
+        self.state = GameState()
+        self.state.initialize(self.layout, len(self.ghosts))
+        self.timestep = 0
+        self.done = self.horizon == 0
+        return self.state
+
+    def step(self, action):
+        """
+        Moves Pacman and then each ghost, stopping as soon as the game ends
+        or reaches its horizon (counted in agent moves, as in Game.run).
+        Returns the (nextState, reward, done) triple, where the reward is
+        the change in score.
+        """
+        if self.done:
+            raise Exception('Can\'t step a finished game; reset it first.')
+        state = self.state
+        score = state.data.score
+        agentIndex = 0
+        while True:
+            state = state.generateSuccessor(agentIndex, action)
+            self.timestep += 1
+            if state.data._win or state.data._lose or self.timestep == self.horizon:
+                self.done = True
+                break
+            agentIndex += 1
+            if agentIndex > len(self.ghosts):
+                break
+            action = self.ghosts[agentIndex - 1].getAction(state)
+        self.state = state
+        return (state, state.data.score - score, self.done)
+
+
 #############################
 # FRAMEWORK TO START A GAME #
 #############################
@@ -542,6 +614,8 @@ def readCommand(argv):
                       help=default('Zoom the size of the graphics window'), default=1.0)
     parser.add_option('-f', '--fixRandomSeed', action='store_true', dest='fixRandomSeed',
                       help='Fixes the random seed to always play the same game', default=False)
+    parser.add_option('--seed', dest='seed',
+                      help='Gives every agent in every game its own random stream derived from this seed', default=None)
     parser.add_option('-r', '--recordActions', action='store_true', dest='record',
                       help='Writes game histories to a file (named by the time they were played)', default=False)
     parser.add_option('--replay', dest='gameToReplay',
@@ -617,6 +691,7 @@ def readCommand(argv):
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    args['seed'] = options.seed
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
@@ -683,17 +758,56 @@ def replayGame(layout, actions, display):
     display.finish()
 
 
-def runGames(layout, horizon, pacman, ghosts, display, numGames, record, numTraining=0, catchExceptions=False, timeout=30):
+def runEpisode(env, pacman):
+    """
+    Plays one game of the Pacman agent in a PacmanEnvironment, calling
+    registerInitialState, observationFunction and final as Game.run does,
+    and returns the final state.
+    """
+    agents = [pacman] + env.ghosts
+    # Nothing reads GameState.explored during training, and hashing every
+    # state for it would cost as much as the rest of the simulation
+    explored = GameState.explored
+    GameState.explored = None
+    try:
+        state = env.reset()
+        for agent in agents:
+            if hasattr(agent, 'registerInitialState'):
+                agent.registerInitialState(state)
+        observe = getattr(pacman, 'observationFunction', None)
+        while not env.isTerminal():
+            if observe is not None:
+                state = observe(state)
+            state, reward, done = env.step(pacman.getAction(state))
+        for agent in agents:
+            if hasattr(agent, 'final'):
+                agent.final(state)
+        return state
+    finally:
+        GameState.explored = explored
+
+
+def runGames(layout, horizon, pacman, ghosts, display, numGames, record, numTraining=0, catchExceptions=False, timeout=30, seed=None):
     import __main__
     __main__.__dict__['_display'] = display
 
     rules = ClassicGameRules(timeout)
     games = []
+    env = PacmanEnvironment(layout, ghosts, horizon)
+    streams = None
+    if seed is not None:
+        streams = util.RandomStreams(seed)
 
     for i in range(numGames):
         # if i % 10 == 0:
         #     print("numGames played: [{}/{}]".format(i, numGames))
         beQuiet = i < numTraining
+        if streams is not None:
+            streams.seedAgents(i, [pacman] + ghosts)
+        if beQuiet and not record and not catchExceptions:
+            # Training games need no display or bookkeeping
+            runEpisode(env, pacman)
+            continue
         if beQuiet:
                 # Suppress output and graphics
             import textDisplay
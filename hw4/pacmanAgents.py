@@ -56,7 +56,7 @@ class GreedyAgent(Agent):
                   for state, action in successors]
         bestScore = max(scored)[0]
         bestActions = [pair[1] for pair in scored if pair[0] == bestScore]
-        return random.choice(bestActions)
+        return self.rand.choice(bestActions)
 
 
 def scoreEvaluation(state):
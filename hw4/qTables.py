@@ -0,0 +1,183 @@
+# qTables.py
+# ----------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Storage for the Q-values of tabular Q-learning agents.
+
+A QTable maps (state, action) pairs to Q-values, 0.0 until set.  Agents ask
+for the values of all the legal actions of a state at once (getQValues),
+so a table only has to find a state once per question.  Tables can be
+saved to and loaded from a file with pickle.
+
+EligibilityTraces keep the traces of agents that learn with eligibility
+traces, Q(lambda) and SARSA(lambda).
+"""
+
+from array import array
+import pickle
+import util
+
+
+class QTable:
+    def getQValue(self, state, action):
+        util.raiseNotDefined()
+
+    def getQValues(self, state, actions):
+        "The Q-values of the actions in state, in order"
+        return [self.getQValue(state, action) for action in actions]
+
+    def setQValue(self, state, action, value):
+        util.raiseNotDefined()
+
+    def save(self, filename):
+        with open(filename, 'wb') as f:
+            pickle.dump(self, f)
+
+    def load(filename):
+        with open(filename, 'rb') as f:
+            return pickle.load(f)
+    load = staticmethod(load)
+
+
+class CounterQTable(QTable):
+    """
+    Q-values in a util.Counter keyed by (state, action).  Each lookup
+    hashes the state again, which for Pacman is a whole GameState.
+    """
+    def __init__(self):
+        self.values = util.Counter()
+
+    def getQValue(self, state, action):
+        return self.values[(state, action)]
+
+    def setQValue(self, state, action, value):
+        self.values[(state, action)] = value
+
+
+class ArrayQTable(QTable):
+    """
+    Q-values in one flat array of doubles, a row per state and a column
+    per action.  States are interned to row numbers the first time they
+    are seen, and the last two states looked up are remembered by
+    identity, so an agent stepping from state to nextState rarely hashes
+    either twice.  Columns are added as new actions turn up.
+
+    States must not change once they have been looked up.
+    """
+    def __init__(self):
+        self.stateIds = {}
+        self.actionColumns = {}
+        self.width = 0
+        self.table = array('d')
+        self.recent = [(None, None), (None, None)]
+
+    def getStateId(self, state):
+        "The row number of state, interning it if it is new"
+        recent = self.recent
+        if recent[0][0] is state:
+            return recent[0][1]
+        if recent[1][0] is state:
+            recent[0], recent[1] = recent[1], recent[0]
+            return recent[0][1]
+        stateId = self.stateIds.get(state)
+        if stateId is None:
+            stateId = self.stateIds[state] = len(self.stateIds)
+            self.table.extend([0.0] * self.width)
+        recent[1] = recent[0]
+        recent[0] = (state, stateId)
+        return stateId
+
+    def getColumn(self, action):
+        column = self.actionColumns.get(action)
+        if column is None:
+            column = self.actionColumns[action] = self.width
+            self.widen()
+        return column
+
+    def widen(self):
+        "Adds a column to every row"
+        old, width = self.table, self.width
+        self.table = array('d', [0.0]) * (len(self.stateIds) * (width + 1))
+        for stateId in range(len(self.stateIds)):
+            self.table[stateId * (width + 1):stateId * (width + 1) + width] = \
+                old[stateId * width:(stateId + 1) * width]
+        self.width = width + 1
+
+    def getQValue(self, state, action):
+        column = self.actionColumns.get(action)
+        if column is None:
+            return 0.0
+        return self.table[self.getStateId(state) * self.width + column]
+
+    def getQValues(self, state, actions):
+        base = self.getStateId(state) * self.width
+        columns, table = self.actionColumns, self.table
+        for action in actions:
+            if action not in columns:
+                self.getColumn(action)
+                base = self.getStateId(state) * self.width
+                table = self.table
+        return [table[base + columns[action]] for action in actions]
+
+    def setQValue(self, state, action, value):
+        column = self.getColumn(action)
+        self.table[self.getStateId(state) * self.width + column] = value
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['recent'] = [(None, None), (None, None)]
+        return state
+
+
+class EligibilityTraces:
+    """
+    Sparse eligibility traces: a dict from whatever the agent learns (a
+    (state, action) pair, a feature number) to its trace.  Traces decay
+    geometrically and are dropped once they fall below threshold, so only
+    the recent past of an episode is kept, however long it runs.
+    """
+    def __init__(self, threshold=0.01):
+        self.threshold = float(threshold)
+        self.traces = {}
+
+    def __len__(self):
+        return len(self.traces)
+
+    def items(self):
+        return self.traces.items()
+
+    def clear(self):
+        self.traces = {}
+
+    def visit(self, keys, values, replacing=False):
+        """
+        Adds values to the traces of keys, or with replacing, sets each
+        trace to at least its value.
+        """
+        traces = self.traces
+        for key, value in zip(keys, values):
+            if replacing:
+                traces[key] = max(traces.get(key, 0.0), value)
+            else:
+                traces[key] = traces.get(key, 0.0) + value
+
+    def decay(self, factor):
+        "Scales every trace by factor, dropping those below threshold"
+        threshold = self.threshold
+        traces = {}
+        for key, trace in self.traces.items():
+            trace *= factor
+            if abs(trace) >= threshold:
+                traces[key] = trace
+        self.traces = traces
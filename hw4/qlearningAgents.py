@@ -15,6 +15,8 @@
 from game import *
 from learningAgents import ReinforcementAgent
 from featureExtractors import *
+from qTables import *
+from replayMemory import *
 
 import gridworld
 
@@ -37,11 +39,45 @@ class QLearningAgent(ReinforcementAgent):
       Functions you should use
         - self.getLegalActions(state)
           which returns legal actions for a state
+
+      The Q-values are kept in a QTable (see qTables.py), named by
+      qTable: ArrayQTable by default, or CounterQTable.
+
+      With a memorySize, transitions go into a replay memory (see
+      replayMemory.py) of that many transitions, named by memory:
+      ReplayMemory or PrioritizedReplayMemory.  Each transition observed
+      then brings an update from a minibatch of batchSize transitions
+      drawn from the memory (see batchUpdate), rather than from itself.
+
+      With a traceDecay (lambda), each error is spread back along the
+      eligibility traces of the episode (see traceUpdate): Watkins's
+      Q(lambda), or SARSA(lambda) in agents that are onPolicy.  Traces
+      below traceThreshold are dropped.  A replay memory takes precedence
+      over traces.
     """
-    def __init__(self, **args):
+    onPolicy = False
+    replacingTraces = True
+
+    def __init__(self, qTable='ArrayQTable', memory='ReplayMemory', memorySize=0, batchSize=32,
+                 traceDecay=0, traceThreshold=0.01, **args):
         "You can initialize Q-values here..."
         ReinforcementAgent.__init__(self, **args)
-        self.q_values = util.Counter()
+        self.q_values = util.lookup(qTable, globals())()
+        self.replayMemory = None
+        if int(memorySize) > 0:
+            self.replayMemory = util.lookup(memory, globals())(int(memorySize))
+        self.batchSize = int(batchSize)
+        self.traceDecay = float(traceDecay)
+        self.traces = None
+        if self.traceDecay > 0 or self.onPolicy:
+            self.traces = EligibilityTraces(traceThreshold)
+        self.nextState = self.nextAction = None
+
+    def startEpisode(self):
+        ReinforcementAgent.startEpisode(self)
+        if self.traces is not None:
+            self.traces.clear()
+        self.nextState = self.nextAction = None
 
     def getQValue(self, state, action):
         """
@@ -50,7 +86,11 @@ class QLearningAgent(ReinforcementAgent):
           or the Q node value otherwise
         """
         "*** YOUR CODE HERE ***"
-        return self.q_values[(state, action)]
+        return self.q_values.getQValue(state, action)
+
+    def getQValues(self, state, actions):
+        "The Q-values of the actions in state, in order"
+        return self.q_values.getQValues(state, actions)
 
     def computeValueFromQValues(self, state):
         """
@@ -67,13 +107,7 @@ class QLearningAgent(ReinforcementAgent):
             return 0
         
         # Get the max Q value
-        max_q_value = float('-inf')
-        
-        for action in actions:
-            q_value = self.getQValue(state, action)
-            max_q_value = max(max_q_value, q_value)
-        
-        return max_q_value
+        return max(self.getQValues(state, actions))
 
     def computeActionFromQValues(self, state):
         """
@@ -88,17 +122,9 @@ class QLearningAgent(ReinforcementAgent):
         if not actions:
             return None
         
-        # Get the max Q value and corresponding action
-        best_action = None
-        max_q_value = float('-inf')
-        
-        for action in actions:
-            q_value = self.getQValue(state, action)
-            if q_value > max_q_value:
-                max_q_value = q_value
-                best_action = action
-        
-        return best_action
+        # Get the first action with the max Q value
+        q_values = self.getQValues(state, actions)
+        return actions[q_values.index(max(q_values))]
 
     def getAction(self, state):
         """
@@ -110,16 +136,22 @@ class QLearningAgent(ReinforcementAgent):
           HINT: You might want to use util.flipCoin(prob)
           HINT: To pick randomly from a list, use random.choice(list)
         """
+        # The action traceUpdate already chose for this state, which may
+        # come back as an equal copy rather than the object it was given
+        if self.nextAction is not None and (state is self.nextState or state == self.nextState):
+            action, self.nextState, self.nextAction = self.nextAction, None, None
+            return action
+
         # Get legal actions
         legalActions = self.getLegalActions(state)
         action = None
         
         # Get random value between 0 and 1
-        random_val = random.random()
+        random_val = self.rand.random()
         
         # If random value is less than epsilon, take random action
         if random_val < self.epsilon:
-            action = random.choice(legalActions)
+            action = self.rand.choice(legalActions)
         else:
             action = self.computeActionFromQValues(state)
 
@@ -134,13 +166,105 @@ class QLearningAgent(ReinforcementAgent):
           it will be called on your behalf
         """
         "*** YOUR CODE HERE ***"
+        if self.replayMemory is not None:
+            return self.replay(state, action, nextState, reward)
+        if self.traces is not None:
+            return self.traceUpdate(state, action, nextState, reward)
+
         q_value = self.getQValue(state, action)
         
         # Compute sample
         sample = reward + self.discount * self.computeValueFromQValues(nextState)
         
         # Update the Q value based on the sample
-        self.q_values[(state, action)] = q_value + self.alpha * (sample - q_value)
+        self.q_values.setQValue(state, action, q_value + self.alpha * (sample - q_value))
+
+    def replay(self, state, action, nextState, reward):
+        """
+          Stores the transition in the replay memory and learns from a
+          minibatch drawn from it, once there are enough transitions.
+        """
+        if self.alpha == 0:
+            # Not learning any more
+            return
+        memory = self.replayMemory
+        self.remember(state, action, nextState, reward)
+        if len(memory) < self.batchSize:
+            return
+        slots, weights = memory.sample(self.batchSize, self.rand)
+        errors = self.batchUpdate([memory.getTransition(slot) for slot in slots], weights)
+        memory.updatePriorities(slots, errors)
+
+    def remember(self, state, action, nextState, reward):
+        "Adds the transition to the replay memory, as batchUpdate will want it"
+        self.replayMemory.add(state, action, nextState, reward)
+
+    def batchUpdate(self, transitions, weights):
+        """
+          Updates the Q-values from a minibatch of (state, action,
+          nextState, reward) transitions at once: every error is measured
+          against the Q-values from before the batch, then each moves its
+          Q-value by alpha times its weight times its error.  Returns the
+          errors.
+        """
+        errors = []
+        for state, action, nextState, reward in transitions:
+            sample = reward + self.discount * self.computeValueFromQValues(nextState)
+            errors.append(sample - self.getQValue(state, action))
+        q_values = self.q_values
+        for (state, action, nextState, reward), weight, error in zip(transitions, weights, errors):
+            q_value = q_values.getQValue(state, action)
+            q_values.setQValue(state, action, q_value + self.alpha * weight * error)
+        return errors
+
+    def traceUpdate(self, state, action, nextState, reward):
+        """
+          The update of Watkins's Q(lambda), or with onPolicy of
+          SARSA(lambda).  The action in nextState is chosen here, before
+          the update, and getAction takes it when asked about nextState.
+
+          The error is measured against the best Q-value of nextState, or
+          with onPolicy against the Q-value of the chosen action.  Each
+          entry of the traces then moves by alpha times its trace times
+          the error.  Afterwards the traces decay by discount * traceDecay,
+          except in Q(lambda) when the chosen action is exploratory: the
+          traces credit the greedy policy, so they are cut off.
+        """
+        self.nextState = self.nextAction = None
+        nextAction = None
+        if self.getLegalActions(nextState):
+            nextAction = QLearningAgent.getAction(self, nextState)
+        nextValue = self.computeValueFromQValues(nextState)
+        greedy = False
+        if nextAction is not None:
+            nextQValue = self.getQValue(nextState, nextAction)
+            greedy = nextQValue == nextValue
+            if self.onPolicy:
+                nextValue = nextQValue
+        error = reward + self.discount * nextValue - self.getQValue(state, action)
+
+        traces = self.traces
+        keys, values = self.getGradient(state, action)
+        traces.visit(keys, values, self.replacingTraces)
+        self.stepAlongTraces(self.alpha * error)
+        if nextAction is not None and (self.onPolicy or greedy):
+            traces.decay(self.discount * self.traceDecay)
+        else:
+            traces.clear()
+        self.nextState, self.nextAction = nextState, nextAction
+
+    def getGradient(self, state, action):
+        """
+          The gradient of Q(state, action) in what the agent learns, as
+          (keys, values).  For a table, that is the entry itself.
+        """
+        return ((state, action),), (1.0,)
+
+    def stepAlongTraces(self, step):
+        "Moves every entry with a trace by step times its trace"
+        q_values = self.q_values
+        for (state, action), trace in self.traces.items():
+            q_values.setQValue(state, action, q_values.getQValue(state, action) + step * trace)
 
     def getPolicy(self, state):
         return self.computeActionFromQValues(state)
@@ -184,28 +308,65 @@ class ApproximateQAgent(PacmanQAgent):
        You should only have to overwrite getQValue
        and update.  All other QLearningAgent functions
        should work as is.
+
+       Features are numbered (see featureExtractors.FeatureIndex) and
+       the weights kept in a list by feature number.  The sparse
+       feature vectors of the last two states seen are cached, so a
+       step extracts the features of each (state, action) once.
+
+       Eligibility traces here are kept by feature number and
+       accumulate the features of each step.
     """
+    replacingTraces = False
+
     def __init__(self, extractor='IdentityExtractor', **args):
         self.featExtractor = util.lookup(extractor, globals())()
         PacmanQAgent.__init__(self, **args)
-        self.weights = util.Counter()
+        self.featureIndex = FeatureIndex()
+        self.weightList = []
+        self.featureCache = [(None, None), (None, None)]
 
     def getWeights(self):
-        return self.weights
+        "The weights as a util.Counter keyed by feature (a copy)"
+        weights = util.Counter()
+        for feature, weight in zip(self.featureIndex.names, self.weightList):
+            weights[feature] = weight
+        return weights
+
+    def getFeatureVector(self, state, action):
+        "The sparse features of (state, action): (feature numbers, values)"
+        cache = self.featureCache
+        if cache[0][0] is not state:
+            if cache[1][0] is state:
+                cache[0], cache[1] = cache[1], cache[0]
+            else:
+                cache[1] = cache[0]
+                cache[0] = (state, {})
+        vectors = cache[0][1]
+        vector = vectors.get(action)
+        if vector is None:
+            vector = vectors[action] = self.featureIndex.toSparse(
+                self.featExtractor.getFeatures(state, action))
+            if len(self.weightList) < len(self.featureIndex):
+                self.weightList.extend([0.0] * (len(self.featureIndex) - len(self.weightList)))
+        return vector
+
+    def getQValues(self, state, actions):
+        return [self.getQValue(state, action) for action in actions]
 
     def getQValue(self, state, action):
         """
           Should return Q(state,action) = w * featureVector
           where * is the dotProduct operator
         """
-        features = self.featExtractor.getFeatures(state, action)
-        weights = self.getWeights()
+        indices, values = self.getFeatureVector(state, action)
+        weights = self.weightList
         
         # Compute the dot product of features and weights
         q_value = 0
         
-        for feature in features:
-            q_value += features[feature] * weights[feature]
+        for index, value in zip(indices, values):
+            q_value += value * weights[index]
         
         return q_value
 
@@ -213,15 +374,67 @@ class ApproximateQAgent(PacmanQAgent):
         """
            Should update your weights based on transition
         """
-        features = self.featExtractor.getFeatures(state, action)
-        weights = self.getWeights()
+        if self.replayMemory is not None:
+            return self.replay(state, action, nextState, reward)
+        if self.traces is not None:
+            return self.traceUpdate(state, action, nextState, reward)
+
+        indices, values = self.getFeatureVector(state, action)
+        weights = self.weightList
         
         # Compute the difference
         difference = reward + self.discount * self.computeValueFromQValues(nextState) - self.getQValue(state, action)
         
         # Update the weights based on weights
-        for feature in features:
-            weights[feature] += self.alpha * difference * features[feature]               
+        for index, value in zip(indices, values):
+            weights[index] += self.alpha * difference * value
+
+    def remember(self, state, action, nextState, reward):
+        """
+          Keeps the features of the transition in the replay memory in
+          place of its states: the sparse vector of (state, action) and
+          those of the legal actions of nextState, which were all worked
+          out when choosing actions.  Replaying it extracts nothing.
+        """
+        nextVectors = tuple([self.getFeatureVector(nextState, nextAction)
+                             for nextAction in self.getLegalActions(nextState)])
+        self.replayMemory.add(self.getFeatureVector(state, action), action, nextVectors, reward)
+
+    def batchUpdate(self, transitions, weights):
+        """
+          Updates the weights from a minibatch of transitions, as kept by
+          remember, at once: the differences are all taken with the
+          weights from before the batch and their steps summed, feature by
+          feature, into a single change of the weights.  Returns the
+          differences.
+        """
+        weights, stepWeights = self.weightList, weights
+        differences = []
+        change = {}
+        for (vector, action, nextVectors, reward), stepWeight in zip(transitions, stepWeights):
+            nextValue = 0
+            if nextVectors:
+                nextValue = max([sum([value * weights[index] for index, value in zip(*nextVector)])
+                                 for nextVector in nextVectors])
+            indices, values = vector
+            q_value = sum([value * weights[index] for index, value in zip(indices, values)])
+            difference = reward + self.discount * nextValue - q_value
+            differences.append(difference)
+            step = self.alpha * stepWeight * difference
+            for index, value in zip(indices, values):
+                change[index] = change.get(index, 0.0) + step * value
+        for index, delta in change.items():
+            weights[index] += delta
+        return differences
+
+    def getGradient(self, state, action):
+        "The gradient of Q(state, action) in the weights: its features"
+        return self.getFeatureVector(state, action)
+
+    def stepAlongTraces(self, step):
+        weights = self.weightList
+        for index, trace in self.traces.items():
+            weights[index] += step * trace
 
     def final(self, state):
         """Called at the end of each game."""
@@ -232,4 +445,38 @@ class ApproximateQAgent(PacmanQAgent):
         if self.episodesSoFar == self.numTraining:
             # you might want to print your weights here for debugging
             # print(self.getWeights())
-            pass
\ No newline at end of file
+            pass
+
+
+class QLambdaAgent(QLearningAgent):
+    "QLearningAgent with Watkins's Q(lambda); traceDecay is lambda"
+
+    def __init__(self, traceDecay=0.9, **args):
+        QLearningAgent.__init__(self, traceDecay=traceDecay, **args)
+
+class SarsaLambdaAgent(QLambdaAgent):
+    "QLambdaAgent learning the values of its own policy: SARSA(lambda)"
+    onPolicy = True
+
+class PacmanQLambdaAgent(PacmanQAgent):
+    """
+    PacmanQAgent with Watkins's Q(lambda).  The random ghosts make long
+    traces noisy, so lambda is shorter than in gridworlds by default.
+    """
+
+    def __init__(self, traceDecay=0.3, **args):
+        PacmanQAgent.__init__(self, traceDecay=traceDecay, **args)
+
+class PacmanSarsaLambdaAgent(PacmanQLambdaAgent):
+    "PacmanQAgent with SARSA(lambda)"
+    onPolicy = True
+
+class ApproximateQLambdaAgent(ApproximateQAgent):
+    "ApproximateQAgent with Watkins's Q(lambda)"
+
+    def __init__(self, traceDecay=0.3, **args):
+        ApproximateQAgent.__init__(self, traceDecay=traceDecay, **args)
+
+class ApproximateSarsaLambdaAgent(ApproximateQLambdaAgent):
+    "ApproximateQAgent with SARSA(lambda)"
+    onPolicy = True
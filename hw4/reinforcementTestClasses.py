@@ -902,3 +902,117 @@ class GridPolicyTest(testClasses.TestCase):
             handle.write('# This is the solution file for %s.\n' % self.path)
             handle.write('# File intentionally blank.\n')
         return True
+
+
+### traces
+### ======
+## Eligibility-trace agents, through update, getAction and getQValue
+
+def randomTransitions(grid, env, numEpisodes):
+    "The (state, action, nextState, reward) transitions of episodes of random play"
+    transitions = []
+    for episode in range(numEpisodes):
+        env.reset()
+        state = env.getCurrentState()
+        while grid.getPossibleActions(state):
+            action = random.choice(grid.getPossibleActions(state))
+            nextState, reward = env.doAction(action)
+            transitions.append((state, action, nextState, reward))
+            state = nextState
+    return transitions
+
+
+def equalCopy(state):
+    "An equal state that is not the same object, as an observation copy is"
+    return tuple(list(state)) if isinstance(state, tuple) else state
+
+
+class TraceAgentTest(testClasses.TestCase):
+
+    def __init__(self, question, testDict):
+        super(TraceAgentTest, self).__init__(question, testDict)
+        self.grid = gridworld.Gridworld(parseGrid(testDict['grid']))
+        if 'noise' in testDict: self.grid.setNoise(float(testDict['noise']))
+        if 'livingReward' in testDict: self.grid.setLivingReward(float(testDict['livingReward']))
+        self.env = gridworld.GridworldEnvironment(self.grid)
+        self.seed = int(testDict['randomSeed'])
+        self.numEpisodes = int(testDict['numEpisodes'])
+        self.opts = {'actionFn': self.env.getPossibleActions, 'epsilon': float(testDict['epsilon']),
+                     'gamma': float(testDict['discount']), 'alpha': float(testDict['learningRate'])}
+
+    def writeSolution(self, moduleDict, filePath):
+        with open(filePath, 'w') as handle:
+            handle.write('# This is the solution file for %s.\n' % self.path)
+            handle.write('# File intentionally blank.\n')
+        return True
+
+
+class ZeroTraceDecayTest(TraceAgentTest):
+    """
+    A QLambdaAgent with a traceDecay of 0 learns the same Q-values as a
+    QLearningAgent from the same transitions.
+    """
+
+    def execute(self, grades, moduleDict, solutionDict):
+        agents = moduleDict['qlearningAgents']
+        random.seed(self.seed)
+        transitions = randomTransitions(self.grid, self.env, self.numEpisodes)
+        qLearning = agents.QLearningAgent(**self.opts)
+        qLambda = agents.QLambdaAgent(traceDecay=0, **self.opts)
+        for transition in transitions:
+            qLearning.update(*transition)
+            qLambda.update(*transition)
+        for state in self.grid.getStates():
+            for action in self.grid.getPossibleActions(state):
+                expected, actual = qLearning.getQValue(state, action), qLambda.getQValue(state, action)
+                if abs(expected - actual) > 1e-9:
+                    self.addMessage('Q(%s, %s) is %f with a traceDecay of 0, but %f in Q-learning' %
+                                    (state, action, actual, expected))
+                    return self.testFail(grades)
+        return self.testPass(grades)
+
+
+class SarsaBootstrapTest(TraceAgentTest):
+    """
+    A SarsaLambdaAgent with a traceDecay of 0 makes the one-step SARSA
+    update, bootstrapping on the action it then takes in nextState even
+    when handed an equal copy of nextState.
+    """
+
+    def execute(self, grades, moduleDict, solutionDict):
+        agent = moduleDict['qlearningAgents'].SarsaLambdaAgent(traceDecay=0, **self.opts)
+        alpha, discount = self.opts['alpha'], self.opts['gamma']
+        random.seed(self.seed)
+        for episode in range(self.numEpisodes):
+            self.env.reset()
+            agent.startEpisode()
+            state = self.env.getCurrentState()
+            pending = None
+            while self.grid.getPossibleActions(state):
+                action = agent.getAction(equalCopy(state))
+                if pending is not None:
+                    lastState, lastAction, oldQValue, reward, nextQValues = pending
+                    if not self.checkUpdate(agent, lastState, lastAction, oldQValue,
+                                            reward + discount * nextQValues[action], alpha):
+                        return self.testFail(grades)
+                nextState, reward = self.env.doAction(action)
+                oldQValue = agent.getQValue(state, action)
+                nextQValues = dict((nextAction, agent.getQValue(nextState, nextAction))
+                                   for nextAction in self.grid.getPossibleActions(nextState))
+                agent.update(state, action, nextState, reward)
+                pending = (state, action, oldQValue, reward, nextQValues)
+                if not nextQValues:
+                    if not self.checkUpdate(agent, state, action, oldQValue, reward, alpha):
+                        return self.testFail(grades)
+                    pending = None
+                state = nextState
+        return self.testPass(grades)
+
+    def checkUpdate(self, agent, state, action, oldQValue, target, alpha):
+        expected = oldQValue + alpha * (target - oldQValue)
+        actual = agent.getQValue(state, action)
+        if abs(expected - actual) > 1e-9:
+            self.addMessage('Q(%s, %s) is %f, but the SARSA update of the action taken next gives %f' %
+                            (state, action, actual, expected))
+            return False
+        return True
@@ -0,0 +1,152 @@
+# replayMemory.py
+# ---------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Replay memories for Q-learning agents.
+
+A replay memory keeps the last capacity transitions an agent has observed,
+(state, action, nextState, reward), so that it can learn from each of them
+many times over rather than once as it happens.  Transitions are kept in
+fixed slots of preallocated lists, the newest overwriting the oldest, and
+are handed out in minibatches by slot number:
+
+  slots, weights = memory.sample(batchSize, rand)
+  state, action, nextState, reward = memory.getTransition(slot)
+
+A PrioritizedReplayMemory samples transitions in proportion to how wrong
+the agent was about them last time, which the agent reports back with
+updatePriorities.
+"""
+
+from array import array
+
+
+class ReplayMemory:
+    """
+    A ring buffer of transitions, sampled uniformly.
+    """
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        if self.capacity < 1:
+            raise Exception('A replay memory needs room for a transition')
+        self.states = [None] * self.capacity
+        self.actions = [None] * self.capacity
+        self.nextStates = [None] * self.capacity
+        self.rewards = array('d', [0.0]) * self.capacity
+        self.size = 0
+        self.next = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, nextState, reward):
+        "Stores a transition over the oldest one if full, and returns its slot"
+        slot = self.next
+        self.states[slot] = state
+        self.actions[slot] = action
+        self.nextStates[slot] = nextState
+        self.rewards[slot] = reward
+        self.next = (slot + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+        return slot
+
+    def getTransition(self, slot):
+        return (self.states[slot], self.actions[slot],
+                self.nextStates[slot], self.rewards[slot])
+
+    def sample(self, batchSize, rand):
+        """
+        Draws batchSize slots with replacement, using the random.Random
+        rand.  Returns the slots and the weight of each in the update,
+        which is 1.0 for all of them here.
+        """
+        size = self.size
+        slots = [int(rand.random() * size) for i in range(batchSize)]
+        return slots, [1.0] * batchSize
+
+    def updatePriorities(self, slots, errors):
+        "Notes the errors of the agent on the transitions of slots"
+        pass
+
+
+class PrioritizedReplayMemory(ReplayMemory):
+    """
+    A ring buffer of transitions, each sampled with probability in
+    proportion to its priority, (|error| + epsilon) ** priorityExponent.
+    New transitions get the highest priority yet seen, so each is
+    sampled at least about once.
+
+    The priorities are the leaves of a sum tree -- a complete binary tree
+    in an array, each node the sum of its children -- so that drawing a
+    transition and changing its priority both take a walk from root to
+    leaf.  Sampling by priority over-represents the transitions drawn, so
+    each comes with the importance weight (N * P(slot)) ** -correction,
+    scaled so the largest is 1.
+    """
+    def __init__(self, capacity, priorityExponent=0.6, correction=0.4, epsilon=0.01):
+        ReplayMemory.__init__(self, capacity)
+        self.priorityExponent = float(priorityExponent)
+        self.correction = float(correction)
+        self.epsilon = float(epsilon)
+        self.leaves = 1
+        while self.leaves < self.capacity:
+            self.leaves *= 2
+        self.tree = array('d', [0.0]) * (2 * self.leaves)
+        self.maxPriority = 1.0
+
+    def add(self, state, action, nextState, reward):
+        slot = ReplayMemory.add(self, state, action, nextState, reward)
+        self.setPriority(slot, self.maxPriority)
+        return slot
+
+    def setPriority(self, slot, priority):
+        tree = self.tree
+        node = slot + self.leaves
+        change = priority - tree[node]
+        while node:
+            tree[node] += change
+            node //= 2
+
+    def getPriority(self, slot):
+        return self.tree[slot + self.leaves]
+
+    def findSlot(self, mass):
+        "The slot whose share of the total priority contains mass"
+        tree, node = self.tree, 1
+        while node < self.leaves:
+            node *= 2
+            if mass >= tree[node] and tree[node + 1] > 0:
+                mass -= tree[node]
+                node += 1
+        return node - self.leaves
+
+    def sample(self, batchSize, rand):
+        """
+        Draws batchSize slots, one from each of batchSize equal shares of
+        the total priority, with their importance weights.
+        """
+        total = self.tree[1]
+        share = total / batchSize
+        slots = [self.findSlot(share * (i + rand.random())) for i in range(batchSize)]
+        weights = [(self.size * self.getPriority(slot) / total) ** -self.correction
+                   for slot in slots]
+        largest = max(weights)
+        return slots, [weight / largest for weight in weights]
+
+    def updatePriorities(self, slots, errors):
+        for slot, error in zip(slots, errors):
+            priority = (abs(error) + self.epsilon) ** self.priorityExponent
+            self.maxPriority = max(self.maxPriority, priority)
+            self.setPriority(slot, priority)
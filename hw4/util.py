@@ -539,14 +539,16 @@ def nSample(distribution, values, n):
     return samples
 
 
-def sample(distribution, values=None):
+def sample(distribution, values=None, randObj=None):
+    if randObj is None:
+        randObj = random
     if type(distribution) == Counter:
         items = sorted(distribution.items())
         distribution = [i[1] for i in items]
         values = [i[0] for i in items]
     if sum(distribution) != 1:
         distribution = normalize(distribution)
-    choice = random.random()
+    choice = randObj.random()
     i, total = 0, distribution[0]
     while choice > total:
         i += 1
@@ -571,16 +573,20 @@ def getProbability(value, distribution, values):
     return total
 
 
-def flipCoin(p):
-    r = random.random()
+def flipCoin(p, randObj=None):
+    if randObj is None:
+        randObj = random
+    r = randObj.random()
     return r < p
 
 
-def chooseFromDistribution(distribution):
+def chooseFromDistribution(distribution, randObj=None):
     "Takes either a counter or a list of (prob, key) pairs and samples"
+    if randObj is None:
+        randObj = random
     if type(distribution) == dict or type(distribution) == Counter:
-        return sample(distribution)
-    r = random.random()
+        return sample(distribution, randObj=randObj)
+    r = randObj.random()
     base = 0.0
     for prob, element in distribution:
         base += prob
@@ -588,6 +594,29 @@ def chooseFromDistribution(distribution):
             return element
 
 
+class RandomStreams:
+    """
+    Independent random number generators derived from one master seed, one
+    per game and agent.  The draws an agent makes in a game then depend
+    only on the seed, the game number and the agent index, not on how many
+    draws came before in that game or others, so games played in another
+    order, in parallel or in batches come out the same as when played one
+    after another.
+    """
+
+    def __init__(self, seed):
+        self.seed = seed
+
+    def getStream(self, game, agentIndex):
+        "Returns a random.Random for the agent in the given game"
+        return random.Random('%s-%d-%d' % (self.seed, game, agentIndex))
+
+    def seedAgents(self, game, agents):
+        "Gives each agent (in agent index order) its stream for the game"
+        for agentIndex, agent in enumerate(agents):
+            agent.rand = self.getStream(game, agentIndex)
+
+
 def nearestPoint(pos):
     """
     Finds the nearest grid point to a position (discretizes).
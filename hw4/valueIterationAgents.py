@@ -27,6 +27,7 @@
 
 
 import mdp, util
+import heapq, itertools
 
 from learningAgents import ValueEstimationAgent
 import collections
@@ -39,8 +40,13 @@ class ValueIterationAgent(ValueEstimationAgent):
         (see mdp.py) on initialization and runs value iteration
         for a given number of iterations using the supplied
         discount factor.
+
+        Given epsilon, it stops early once the values are within
+        epsilon of their fixed point (see hasConverged).  The
+        max-norm residual of each iteration is kept in
+        self.residuals.
     """
-    def __init__(self, mdp: mdp.MarkovDecisionProcess, discount = 0.9, iterations = 100):
+    def __init__(self, mdp: mdp.MarkovDecisionProcess, discount = 0.9, iterations = 100, epsilon = None):
         """
           Your value iteration agent should take an mdp on
           construction, run the indicated number of iterations
@@ -56,9 +62,23 @@ class ValueIterationAgent(ValueEstimationAgent):
         self.mdp = mdp
         self.discount = discount
         self.iterations = iterations
+        self.epsilon = epsilon
+        self.residuals = []
         self.values = util.Counter() # A Counter is a dict with default 0
         self.runValueIteration()
 
+    def hasConverged(self):
+        """
+          Whether the last iteration moved no value by as much as
+          epsilon * (1 - discount) / discount, which puts every value
+          within epsilon of the fixed point.
+        """
+        if self.epsilon is None or not self.residuals:
+            return False
+        if self.discount == 0:
+            return True
+        return self.residuals[-1] < self.epsilon * (1 - self.discount) / self.discount
+
     def runValueIteration(self):
         """
           Run the value iteration algorithm. Note that in standard
@@ -82,10 +102,15 @@ class ValueIterationAgent(ValueEstimationAgent):
                     for action in self.mdp.getPossibleActions(state):
                         action_values.append(self.computeQValueFromValues(state, action))
                         
-                    # Store the maximum value    
-                    new_values[state] = max(action_values)
+                    # Store the maximum value, 0 if there are no actions
+                    new_values[state] = max(action_values) if action_values else 0
             
+            # Track the largest change and stop once converged
+            self.residuals.append(max([abs(new_values[state] - self.values[state])
+                                       for state in self.mdp.getStates()] or [0]))
             self.values = new_values
+            if self.hasConverged():
+                break
 
     def getValue(self, state):
         """
@@ -148,3 +173,161 @@ class ValueIterationAgent(ValueEstimationAgent):
 
     def getQValue(self, state, action):
         return self.computeQValueFromValues(state, action)
+
+
+class MatrixValueIterationAgent(ValueIterationAgent):
+    """
+        A ValueIterationAgent that compiles its mdp first (see
+        mdp.CompiledMDP), so that each sweep works on numbered states
+        and sparse transition rows rather than asking the mdp for
+        every transition again.  It computes the same values.
+    """
+    def runValueIteration(self):
+        self.compiled = mdp.CompiledMDP(self.mdp)
+        values = [0.0] * self.compiled.getNumStates()
+        for i in range(self.iterations):
+            newValues = self.compiled.backup(values, self.discount)
+            self.residuals.append(max([abs(new - old) for new, old in zip(newValues, values)] or [0]))
+            values = newValues
+            if self.hasConverged():
+                break
+        self.setValues(values)
+
+    def setValues(self, values):
+        "Keeps the list of values of the compiled states"
+        self.valueList = values
+        self.values = self.compiled.toCounter(values)
+
+    def computeQValueFromValues(self, state, action):
+        s = self.compiled.stateIndex.get(state)
+        p = self.compiled.pairIndex.get((s, action))
+        if p is None:
+            return ValueIterationAgent.computeQValueFromValues(self, state, action)
+        return self.compiled.getQValue(p, self.valueList, self.discount)
+
+
+class AsynchronousValueIterationAgent(MatrixValueIterationAgent):
+    """
+        An AsynchronousValueIterationAgent takes a Markov decision process
+        (see mdp.py) on initialization and runs cyclic value iteration
+        for a given number of iterations using the supplied
+        discount factor.  Each iteration backs up a single state in
+        place, taking the states in the order of mdp.getStates(), so
+        later states already see the new values of earlier ones.
+        An iteration that comes to a terminal state leaves it alone.
+    """
+    def __init__(self, mdp, discount = 0.9, iterations = 1000):
+        ValueIterationAgent.__init__(self, mdp, discount, iterations)
+
+    def runValueIteration(self):
+        self.compiled = compiled = mdp.CompiledMDP(self.mdp)
+        values = [0.0] * compiled.getNumStates()
+        numStates = len(values)
+        for i in range(self.iterations):
+            s = i % numStates
+            if not compiled.terminal[s]:
+                values[s] = max(compiled.getQValues(s, values, self.discount))
+        self.setValues(values)
+
+
+class PrioritizedSweepingValueIterationAgent(AsynchronousValueIterationAgent):
+    """
+        A PrioritizedSweepingValueIterationAgent takes a Markov decision
+        process (see mdp.py) on initialization and runs prioritized
+        sweeping value iteration for a given number of iterations using
+        the supplied discount factor.  Each iteration backs up the state
+        whose value is furthest from its Bellman backup, then requeues
+        those of its predecessors that are now more than theta off.  It
+        stops early once no state is.
+    """
+    def __init__(self, mdp, discount = 0.9, iterations = 100, theta = 1e-5):
+        self.theta = theta
+        ValueIterationAgent.__init__(self, mdp, discount, iterations)
+
+    def runValueIteration(self):
+        self.compiled = compiled = mdp.CompiledMDP(self.mdp)
+        predecessors = compiled.getPredecessors()
+        values = [0.0] * compiled.getNumStates()
+
+        # A heap of (-error, count, state) in which only the entry
+        # matching a state's current priority counts, as in
+        # util.PriorityQueue.update; the count keeps states of equal
+        # priority first in, first out
+        heap, priorities, counter = [], {}, itertools.count()
+        def update(s, priority):
+            if s not in priorities or priorities[s] > priority:
+                priorities[s] = priority
+                heapq.heappush(heap, (priority, next(counter), s))
+
+        for s in range(len(values)):
+            if not compiled.terminal[s]:
+                update(s, -abs(values[s] - max(compiled.getQValues(s, values, self.discount))))
+
+        for i in range(self.iterations):
+            while heap and priorities.get(heap[0][2]) != heap[0][0]:
+                heapq.heappop(heap)
+            if not heap:
+                break
+            priority, order, s = heapq.heappop(heap)
+            del priorities[s]
+            if not compiled.terminal[s]:
+                values[s] = max(compiled.getQValues(s, values, self.discount))
+            for p in predecessors[s]:
+                if not compiled.terminal[p]:
+                    error = abs(values[p] - max(compiled.getQValues(p, values, self.discount)))
+                    if error > self.theta:
+                        update(p, -error)
+        self.setValues(values)
+
+
+class PolicyIterationAgent(MatrixValueIterationAgent):
+    """
+        A PolicyIterationAgent takes a Markov decision process (see
+        mdp.py) on initialization and runs policy iteration for at
+        most the given number of iterations.  Each iteration evaluates
+        the policy exactly (see mdp.CompiledMDP.evaluatePolicy) and
+        makes it greedy for the resulting values, stopping once the
+        policy no longer changes.  Without discounting, a policy that
+        may never end has no exact values, and is evaluated by
+        backups instead.  self.residuals holds the largest
+        Bellman error of each policy's values.
+    """
+    def runValueIteration(self):
+        self.compiled = compiled = mdp.CompiledMDP(self.mdp)
+        values = [0.0] * compiled.getNumStates()
+        policy, backedUp = compiled.improvePolicy([None] * len(values), values, self.discount)
+        for i in range(self.iterations):
+            values = compiled.evaluatePolicy(policy, self.discount)
+            newPolicy, backedUp = compiled.improvePolicy(policy, values, self.discount)
+            self.residuals.append(max([abs(new - old) for new, old in zip(backedUp, values)] or [0]))
+            if newPolicy == policy or self.hasConverged():
+                break
+            policy = newPolicy
+        self.policy = policy
+        self.setValues(values)
+
+
+class ModifiedPolicyIterationAgent(PolicyIterationAgent):
+    """
+        A ModifiedPolicyIterationAgent runs policy iteration with k
+        backups of each policy rather than exact evaluation, starting
+        from the values of the last one.  With k = 1 this is value
+        iteration.  It runs the given number of iterations, or stops
+        early given epsilon, as a ValueIterationAgent does.
+    """
+    def __init__(self, mdp, discount = 0.9, iterations = 100, epsilon = None, k = 10):
+        self.k = int(k)
+        PolicyIterationAgent.__init__(self, mdp, discount, iterations, epsilon)
+
+    def runValueIteration(self):
+        self.compiled = compiled = mdp.CompiledMDP(self.mdp)
+        values = [0.0] * compiled.getNumStates()
+        policy = [None] * len(values)
+        for i in range(self.iterations):
+            policy, backedUp = compiled.improvePolicy(policy, values, self.discount)
+            self.residuals.append(max([abs(new - old) for new, old in zip(backedUp, values)] or [0]))
+            values = compiled.evaluatePolicy(policy, self.discount, backedUp, self.k - 1)
+            if self.hasConverged():
+                break
+        self.policy = policy
+        self.setValues(values)